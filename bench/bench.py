@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# coding:utf-8
+
+"""
+throughput benchmarks of the lexer and the parser
+
+C-- inputs are generated by random derivations of `demo/cmm.bnf.txt`, C
+inputs are random streams of the tokens of `demo/c.lex.py`; every
+benchmark runs in a process of its own, so that its peak memory is its
+own
+
+usage: python bench/bench.py [--size 64K,1M] [--seed 0]
+           [--save baseline.json] [--compare baseline.json]
+           [--tolerance 0.2] [--timeout 3600]
+"""
+
+import json
+import multiprocessing
+import os
+import Queue
+import os.path as p
+import random
+import resource
+import runpy
+import sys
+import time
+
+DEMO = p.join(p.dirname(p.abspath(__file__)), os.pardir, 'demo')
+ROOT = p.join(DEMO, os.pardir)
+
+# lexemes of the C-- tokens which are not keywords
+CMM_LEXEMES = {
+    'ASSIGN': '=', 'PLUS': '+', 'MINUS': '-', 'TIMES': '*', 'DIVIDE': '/',
+    'OR': '||', 'AND': '&&', 'NOT': '!', 'LT': '<', 'LE': '<=', 'GT': '>',
+    'GE': '>=', 'EQ': '==', 'NE': '!=', 'COMMA': ',', 'SEMI': ';',
+    'LPAREN': '(', 'RPAREN': ')', 'LBRACKET': '[', 'RBRACKET': ']',
+    'LBRACE': '{', 'RBRACE': '}',
+    'INTCON': lambda rng: str(rng.randint(0, 99999)),
+    'STRINGCON': lambda rng: '"s%d\\n"' % rng.randint(0, 999),
+    'CHARCON': lambda rng: "'%s'" % rng.choice(['a', 'x', '0', '\\n']),
+    'ID': lambda rng: 'v%d' % rng.randint(0, 999),
+}
+
+# lexemes of the C tokens which are not keywords
+C_LEXEMES = {
+    'INTEGER': lambda rng: str(rng.randint(0, 99999)),
+    'REAL': lambda rng: '%d.%de%d' % (rng.randint(0, 999),
+        rng.randint(0, 999), rng.randint(0, 30)),
+    'STRING': lambda rng: '"s%d\\t"' % rng.randint(0, 999),
+    'CHARACTER': lambda rng: "'%s'" % rng.choice('abcxyz'),
+    'COMMENT': '/* a comment\n */', 'CPPCOMMENT': '// a comment\n',
+    'PLUS': '+', 'MINUS': '-', 'TIMES': '*', 'DIVIDE': '/', 'MOD': '%',
+    'OR': '|', 'AND': '&', 'NOT': '~', 'XOR': '^', 'LSHIFT': '<<',
+    'RSHIFT': '>>', 'LOR': '||', 'LAND': '&&', 'LNOT': '!', 'LT': '<',
+    'LE': '<=', 'GT': '>', 'GE': '>=', 'EQ': '==', 'NE': '!=',
+    'EQUAL': '=', 'TIMESEQUAL': '*=', 'DIVEQUAL': '/=', 'MODEQUAL': '%=',
+    'PLUSEQUAL': '+=', 'MINUSEQUAL': '-=', 'LSHIFTEQUAL': '<<=',
+    'RSHIFTEQUAL': '>>=', 'ANDEQUAL': '&=', 'XOREQUAL': '^=',
+    'OREQUAL': '|=', 'PLUSPLUS': '++', 'MINUSMINUS': '--', 'ARROW': '->',
+    'TERNARY': '?', 'LPAREN': '(', 'RPAREN': ')', 'LBRACKET': '[',
+    'RBRACKET': ']', 'LBRACE': '{', 'RBRACE': '}', 'COMMA': ',',
+    'PERIOD': '.', 'SEMI': ';', 'COLON': ':', 'ELLIPSIS': '...',
+    'NEWLINE': '\n', 'WHITESPACE': '\t',
+    'ID': lambda rng: 'v%d' % rng.randint(0, 999),
+}
+
+# keywords of C, whose lexemes are their names in lowercase
+C_KEYWORDS = ('CHAR', 'INT', 'LONG', 'FLOAT', 'DOUBLE', 'VOID', 'CONST',
+    'SIGNED', 'UNSIGNED', 'STATIC', 'STRUCT', 'UNION', 'AUTO', 'BREAK',
+    'CASE', 'CONTINUE', 'DEFAULT', 'DO', 'ELSE', 'ENUM', 'EXTERN', 'FOR',
+    'GOTO', 'IF', 'REGISTER', 'RETURN', 'SIZEOF', 'SWITCH', 'TYPEDEF',
+    'VOLATILE', 'WHILE')
+
+# metrics of which a higher value is better
+THROUGHPUTS = ('tokens_per_sec', 'steps_per_sec', 'bytes_per_sec')
+
+def parse_size(text):
+    """the number of bytes of a size such as `512`, `64K` or `100M`"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper().rstrip('B')
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def lexeme(lexemes, token, rng):
+    """a lexeme of `token`, a keyword if it is not in `lexemes`"""
+    sample = lexemes.get(token, token.lower())
+    return sample(rng) if callable(sample) else sample
+
+def read_grammar():
+    """the rules of `demo/cmm.bnf.txt`, as a dict lhs -> list of rhs"""
+    rules = {}
+    order = []
+    with open(p.join(DEMO, 'cmm.bnf.txt'), 'r') as f:
+        for line in f:
+            if line.strip():
+                lhs, rhs = line.split(':')
+                rhs = [term for term in rhs.split() if term != 'epsilon']
+                if lhs.strip() not in rules:
+                    order.append(lhs.strip())
+                rules.setdefault(lhs.strip(), []).append(rhs)
+    return order[0], rules
+
+def heights(rules):
+    """
+    the least height of a derivation tree of every nonterminal, and of
+    every rule as a dict (lhs, index) -> height
+    """
+    height = {}
+    rule_height = {}
+    changed = True
+    while changed:
+        changed = False
+        for lhs, alternatives in rules.items():
+            for i, rhs in enumerate(alternatives):
+                if all(term in height or term not in rules for term in rhs):
+                    value = 1 + max([height.get(term, 0) for term in rhs] \
+                        or [0])
+                    if value < rule_height.get((lhs, i), sys.maxint):
+                        rule_height[lhs, i] = value
+                        changed = True
+                    if value < height.get(lhs, sys.maxint):
+                        height[lhs] = value
+    return height, rule_height
+
+def cmm_corpus(size, rng, max_depth=12):
+    """
+    C-- source of about `size` bytes, made of random derivations of the
+    start symbol; past `max_depth` only the shortest rules are chosen
+    """
+    start, rules = read_grammar()
+    _, rule_height = heights(rules)
+    shortest = dict((lhs, [i for i in range(len(alternatives)) \
+        if rule_height[lhs, i] == min(rule_height[lhs, j] \
+        for j in range(len(alternatives)))]) \
+        for lhs, alternatives in rules.items())
+    chunks = []
+    length = 0
+    while length < size:
+        words = []
+        stack = [(start, 0)]
+        while stack:
+            term, depth = stack.pop()
+            if term not in rules:
+                words.append(lexeme(CMM_LEXEMES, term, rng))
+                if term in ('SEMI', 'LBRACE', 'RBRACE'):
+                    words.append('\n')
+                continue
+            if depth < max_depth:
+                rhs = rng.choice(rules[term])
+            else:
+                rhs = rules[term][rng.choice(shortest[term])]
+            stack += [(t, depth + 1) for t in reversed(rhs)]
+        if rng.random() < 0.2:
+            words.append('// generated\n')
+        chunk = ' '.join(words)
+        chunks.append(chunk)
+        length += len(chunk) + 1
+    return '\n'.join(chunks)
+
+def c_corpus(size, tokens, rng):
+    """C tokens of about `size` bytes, drawn at random from `tokens`"""
+    words = []
+    length = 0
+    while length < size:
+        word = lexeme(C_LEXEMES, rng.choice(tokens), rng)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+def demo_path():
+    """make the demo modules and yaly importable"""
+    for path in (ROOT, DEMO):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+def load_demo(name):
+    """run the demo module `name`, return its globals"""
+    demo_path()
+    return runpy.run_path(p.join(DEMO, name), run_name='__bench__')
+
+def bench_startup(name, prepare=None):
+    """
+    the cost of running the demo module `name`, after importing the
+    module `prepare` it depends on
+    """
+    if prepare is not None:
+        demo_path()
+        __import__(prepare)
+    start = time.time()
+    load_demo(name)
+    return {'seconds': time.time() - start}
+
+def bench_lex(module, lexer_name, corpus):
+    """scan `corpus` with the lexer `lexer_name` of the demo `module`"""
+    lexer = load_demo(module)[lexer_name]
+    start = time.time()
+    lexer.set_string(corpus)
+    count = 0
+    for _ in lexer.get_next_token():
+        count += 1
+    seconds = time.time() - start
+    return {'seconds': seconds, 'tokens': count,
+        'tokens_per_sec': count / seconds,
+        'bytes_per_sec': len(corpus) / seconds}
+
+def bench_parse(corpus):
+    """parse `corpus` with the C-- parser"""
+    parser = load_demo('cmm_yacc.py')['parser']
+    steps = [0]
+    def count(event, value):
+        """count the parse steps"""
+        steps[0] += 1
+    parser.parse(corpus, count)
+    start = time.time()
+    parser.parse(corpus)
+    seconds = time.time() - start
+    return {'seconds': seconds, 'steps': steps[0],
+        'steps_per_sec': steps[0] / seconds,
+        'bytes_per_sec': len(corpus) / seconds}
+
+def __child__(queue, func, args):
+    """run a benchmark, send its result and peak memory to `queue`"""
+    try:
+        result = func(*args)
+        result['peak_kb'] = resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss
+        queue.put(result)
+    except Exception, e:
+        queue.put({'error': '%s: %s' % (type(e).__name__, e)})
+
+def measure(timeout, func, *args):
+    """
+    run `func(*args)` in a process of its own, which is stopped after
+    `timeout` seconds; a process which dies without a result, such as
+    one killed for lack of memory, gives an error
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=__child__,
+        args=(queue, func, args))
+    process.start()
+    deadline = time.time() + timeout
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=1)
+        except Queue.Empty:
+            if not process.is_alive():
+                try: # the result may be put just before the exit
+                    result = queue.get(timeout=1)
+                except Queue.Empty:
+                    result = {'error': 'exited with code %s without ' \
+                        'a result' % process.exitcode}
+            elif time.time() > deadline:
+                process.terminate()
+                result = {'error': 'timed out after %ss' % timeout}
+    process.join()
+    return result
+
+def run(sizes, seed, timeout):
+    """run all the benchmarks, return their results by name"""
+    results = {}
+    results['startup_lex_cmm'] = measure(timeout, bench_startup,
+        'cmm_lex.py')
+    results['startup_yacc_cmm'] = measure(timeout, bench_startup,
+        'cmm_yacc.py', 'cmm_lex')
+    results['startup_lex_c'] = measure(timeout, bench_startup, 'c.lex.py')
+    c_tokens = sorted(set(C_LEXEMES) | set(C_KEYWORDS))
+    for size in sizes:
+        rng = random.Random(seed)
+        corpus = cmm_corpus(parse_size(size), rng)
+        results['lex_cmm_' + size] = measure(timeout, bench_lex,
+            'cmm_lex.py', 'lexer', corpus)
+        results['parse_cmm_' + size] = measure(timeout, bench_parse, corpus)
+        corpus = c_corpus(parse_size(size), c_tokens, rng)
+        results['lex_c_' + size] = measure(timeout, bench_lex, 'c.lex.py',
+            'scanner', corpus)
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    return the regressions of `results` from `baseline`: a throughput
+    lower, or a time or a peak memory higher, by more than `tolerance`,
+    and the benchmarks of the baseline which failed or did not run
+    """
+    regressions = []
+    for name, old in sorted(baseline.items()):
+        if name not in results:
+            regressions.append('%s: not run' % name)
+            continue
+        new = results[name]
+        if 'error' in new:
+            regressions.append('%s: %s' % (name, new['error']))
+            continue
+        for metric, old_value in sorted(old.items()):
+            value = new.get(metric)
+            if not isinstance(old_value, (int, float)) or \
+                not isinstance(value, (int, float)) or \
+                metric in ('tokens', 'steps'):
+                continue
+            if metric in THROUGHPUTS:
+                worse = value < old_value * (1 - tolerance)
+            else:
+                worse = value > old_value * (1 + tolerance)
+            if worse:
+                regressions.append('%s %s: %.4g -> %.4g' % \
+                    (name, metric, old_value, value))
+    return regressions
+
+def main(argv):
+    """command line entry"""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--size', default='64K',
+        help='comma separated input sizes, such as 1K,1M,100M')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results to this file')
+    parser.add_argument('--compare', help='baseline file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--timeout', type=float, default=3600,
+        help='seconds after which a benchmark is stopped')
+    args = parser.parse_args(argv)
+    results = run([size.strip() for size in args.size.split(',')],
+        args.seed, args.timeout)
+    for name, result in sorted(results.items()):
+        print '%-20s %s' % (name, ', '.join('%s=%.4g' % (metric, value) \
+            if isinstance(value, float) else '%s=%s' % (metric, value) \
+            for metric, value in sorted(result.items())))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'seed': args.seed,
+                'results': results}, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print 'regression:', regression
+        if regressions:
+            return 1
+    return 1 if any('error' in result for result in results.values()) \
+        else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -245,11 +245,7 @@ t_CHARACTER = concat([
 ])
 
 # Comment (C-Style)
-def t_COMMENT(t):
-    t.lexer.lineno += t.value.count('\n')
-    return t
-
-t_COMMENT.__doc__ = concat([
+t_COMMENT = concat([
     '/',
     '*',
     loop(
@@ -263,11 +259,7 @@ t_COMMENT.__doc__ = concat([
 ])
 
 # Comment (C++-Style)
-def t_CPPCOMMENT(t):
-    t.lexer.lineno += 1
-    return t
-
-t_CPPCOMMENT.__doc__ = concat([
+t_CPPCOMMENT = concat([
     '/',
     '/',
     loop(diff(['\n'])),
@@ -275,17 +267,14 @@ t_CPPCOMMENT.__doc__ = concat([
 ])
 
 # Newline
-def t_NEWLINE(t):
-    t.lexer.lineno += 1
-    return t
-
-t_NEWLINE.__doc__ = escape('\n')
+t_NEWLINE = escape('\n')
 
 scanner = lex.lex()
 
-import os.path as p
-with open(p.join(p.dirname(__file__), 'temp.c'), 'r') as f:
-    s = f.read()
-scanner.set_string(s)
-for token in scanner.get_next_token():
-    print token
+if __name__ == '__main__':
+    import os.path as p
+    with open(p.join(p.dirname(__file__), 'temp.c'), 'r') as f:
+        s = f.read()
+    scanner.set_string(s)
+    for token in scanner.get_next_token():
+        print token
@@ -40,6 +40,9 @@ tokens = (
     'ID',
 )
 
+# scanned but never returned
+ignore_tokens = ('COMMENT', 'NEWLINE', 'WHITESPACE')
+
 # Types
 t_CHAR = yare.concat(list('char'))
 t_INT = yare.concat(list('int'))
@@ -84,11 +87,7 @@ t_CHARCON = yare.concat([
     '\'',
 ])
 
-def t_COMMENT(t):
-    t.lexer.lineno += 1
-    t.skip = True
-    return t
-t_COMMENT.__doc__ = yare.concat([
+t_COMMENT = yare.concat([
     '/',
     '/',
     yare.loop(yare.diff(['\n'])),
@@ -122,17 +121,10 @@ t_LBRACE = yare.escape('{')
 t_RBRACE = yare.escape('}')
 
 # Newlines
-def t_NEWLINE(t):
-    t.lexer.lineno += t.value.count('\n')
-    t.skip = True
-    return t
-t_NEWLINE.__doc__ = yare.loop_('\n')
+t_NEWLINE = yare.loop_('\n')
 
 # Whitespaces
-def t_WHITESPACE(t):
-    t.skip = True
-    return t
-t_WHITESPACE.__doc__ = yare.loop_(yare.select([' ', '\t']))
+t_WHITESPACE = yare.loop_(yare.select([' ', '\t']))
 
 # Identifiers
 t_ID = yare.concat([
@@ -4,6 +4,7 @@
 """yacc definition for C--"""
 
 import os.path as p
+import sys
 
 import yaly.yacc as yacc
 from cmm_lex import lexer, tokens
@@ -11,8 +12,21 @@ from cmm_lex import lexer, tokens
 with open(p.join(p.dirname(__file__), 'cmm.bnf.txt'), 'r') as f:
     grammar = [ line.strip() for line in f.xreadlines() if line.strip() ]
 
-parser = yacc.yacc()
+# `exprs` derives epsilon, so a call without arguments is ambiguous
+precedence = ('unexpridlp : RPAREN',)
 
-with open(p.join(p.dirname(__file__), 'cmm_input.c'), 'r') as f:
-    s = f.read()
-parser.parse(s)
+parser = yacc.yacc(strict=True)
+
+def build_parser():
+    """the parser, for yacc.parse_files"""
+    return parser
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # python cmm_yacc.py file.c ... : parse the files in parallel
+        for result in yacc.parse_files(build_parser, sys.argv[1:]):
+            print result.path, 'ok' if result.error is None else result.error
+    else:
+        with open(p.join(p.dirname(__file__), 'cmm_input.c'), 'r') as f:
+            s = f.read()
+        parser.parse(s, yacc.print_tracer)
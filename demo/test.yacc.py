@@ -16,4 +16,4 @@ grammar = (
 parser = yacc.yacc()
 
 while True:
-    parser.parse(raw_input('>>> '))
+    parser.parse(raw_input('>>> '), yacc.print_tracer)
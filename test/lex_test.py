@@ -3,14 +3,283 @@
 
 """unit test cases for lex.py"""
 
+import os
+import shutil
+import tempfile
+import threading
 import unittest
+import yare
 import yaly.lex as lex
 
+def build_lexer(cache_dir=None, number=yare.loop_(yare.DIGIT)):
+    """a small lex file"""
+    tokens = ('IF', 'ID', 'NUMBER', 'NEWLINE', 'WHITESPACE')
+    t_IF = yare.concat(list('if'))
+    t_ID = yare.loop_(yare.LOWERCASE)
+    t_NUMBER = number
+    def t_NEWLINE(t):
+        t.lexer.lineno += t.value.count('\n')
+        t.skip = True
+        return t
+    t_NEWLINE.__doc__ = yare.loop_('\n')
+    def t_WHITESPACE(t):
+        t.skip = True
+        return t
+    t_WHITESPACE.__doc__ = yare.loop_(' ')
+    return lex.lex(cache_dir)
+
+def build_ignoring_lexer():
+    """a lex file which ignores spaces, newlines and comments"""
+    tokens = ('ID', 'NUMBER', 'COMMENT')
+    ignore_tokens = ('COMMENT',)
+    t_ignore = ' \t\n'
+    t_ID = yare.loop_(yare.LOWERCASE)
+    t_NUMBER = yare.loop_(yare.DIGIT)
+    def t_COMMENT(t):
+        raise AssertionError('function of an ignored token called')
+    t_COMMENT.__doc__ = yare.concat(['#', yare.loop(yare.LOWERCASE)])
+    return lex.lex()
+
+def build_skipping_lexer():
+    """a lex file whose skipped token also matches a later one"""
+    tokens = ('SPACE', 'WORD')
+    def t_SPACE(t):
+        t.skip = True
+        return t
+    t_SPACE.__doc__ = yare.loop_(' ')
+    t_WORD = yare.loop_(yare.select([' ', 'a']))
+    return lex.lex()
+
+def build_comment_lexer():
+    """a lex file whose block comments and ABCD begin with other tokens"""
+    tokens = ('COMMENT', 'ABCD', 'ID', 'SLASH', 'STAR')
+    t_ignore = ' '
+    t_COMMENT = yare.concat(['/', yare.escape('*'),
+        yare.loop(yare.diff(['/'])), yare.escape('*'), '/'])
+    t_ABCD = yare.concat(list('abcd'))
+    t_ID = yare.LOWERCASE
+    t_SLASH = '/'
+    t_STAR = yare.escape('*')
+    return lex.lex()
+
 class TestLexer(unittest.TestCase):
     """test: Lexer.get_next_token"""
     def setUp(self):
         """set up a lex file"""
-        pass
+        self.lexer = build_lexer()
+    def tokenize(self, string):
+        """lexical units and values of `string`"""
+        self.lexer.set_string(string)
+        return [(t.lexical_unit(), t.value, t.lineno) \
+            for t in self.lexer.get_next_token()]
+    def test_tokens(self):
+        """longest match and precedence"""
+        self.assertEqual(self.tokenize('if iff 42\nx'), [
+            ('IF', 'if', 1), ('ID', 'iff', 1), ('NUMBER', '42', 1),
+            ('ID', 'x', 2),
+        ])
+    def test_classify(self):
+        """a skipped lexeme is not offered to later tokens"""
+        lexer = build_skipping_lexer()
+        lexer.set_string('  ')
+        self.assertEqual(list(lexer.get_next_token()), [])
+        lexer.set_string('a a')
+        self.assertEqual([(t.lexical_unit(), t.value) \
+            for t in lexer.get_next_token()], [('WORD', 'a a')])
+    def test_memo(self):
+        """the memo of lexical units does not grow without bound"""
+        size = lex.__MEMO_SIZE__
+        lex.__MEMO_SIZE__ = 8
+        try:
+            for i in range(3):
+                self.tokenize(' '.join('x' * j for j in range(1, 30)))
+                self.assertTrue(len(self.lexer.__units__) <= 8)
+            self.assertEqual(self.tokenize('if x'),
+                [('IF', 'if', 1), ('ID', 'x', 1)])
+        finally:
+            lex.__MEMO_SIZE__ = size
+    def test_compact(self):
+        """compact tokens refer to their lexemes by offsets"""
+        self.lexer.set_string('if x\n42')
+        tokens = list(self.lexer.get_next_token(compact=True))
+        self.assertEqual([tuple(t[:4]) for t in tokens],
+            [('IF', 0, 2, 1), ('ID', 3, 4, 1), ('NUMBER', 5, 7, 2)])
+        self.assertEqual([t.value for t in tokens], ['if', 'x', '42'])
+        self.assertEqual(tokens[2].lexical_unit(), 'NUMBER')
+    def test_columns(self):
+        """token columns hold the fields of the compact tokens"""
+        self.lexer.set_string('if x\n42')
+        expected = list(self.lexer.get_next_token(compact=True))
+        self.lexer.set_string('if x\n42')
+        columns = self.lexer.get_token_columns()
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(list(columns.starts), [0, 3, 5])
+        self.assertEqual(list(columns.lines), [1, 1, 2])
+        self.assertEqual([columns.unit(i) for i in range(3)],
+            ['IF', 'ID', 'NUMBER'])
+        self.assertEqual(list(columns), expected)
+        self.assertEqual(columns[2].value, '42')
+    def test_inputs(self):
+        """buffers, memoryviews and mapped files are scanned in place"""
+        expected = self.tokenize('if iff 42\nx')
+        self.assertEqual(self.tokenize(u'if iff 42\nx'), expected)
+        self.lexer.set_string(u'if iff 42\nx')
+        self.lexer.__pos__ = 3
+        remaining = self.lexer.__remaining__()
+        self.assertNotIsInstance(remaining, unicode)
+        self.assertEqual(list(remaining), list(u'iff 42\nx'))
+        self.assertEqual((remaining[1], remaining[-1], remaining[:3]),
+            (u'f', u'x', u'iff'))
+        self.lexer.set_string(memoryview('if iff 42\nx'))
+        self.assertEqual([(t.lexical_unit(), t.value, t.lineno) \
+            for t in self.lexer.get_next_token()], expected)
+        self.lexer.set_string(buffer('if iff 42\nx'))
+        self.assertEqual([(t.lexical_unit(), t.value, t.lineno) \
+            for t in self.lexer.get_next_token()], expected)
+        fd, path = tempfile.mkstemp()
+        try:
+            os.write(fd, 'if iff 42\nx')
+            os.close(fd)
+            self.lexer.set_file(path)
+            self.assertEqual([(t.lexical_unit(), t.value, t.lineno) \
+                for t in self.lexer.get_next_token()], expected)
+        finally:
+            os.remove(path)
+    def test_feed(self):
+        """lexemes split across chunks are matched as a whole"""
+        string = 'if iff 42\nx iffy 7'
+        expected = self.tokenize(string)
+        for i in range(len(string) + 1):
+            tokens = self.lexer.feed(string[:i]) + \
+                self.lexer.feed(string[i:]) + self.lexer.close()
+            self.assertEqual([(t.lexical_unit(), t.value, t.lineno) \
+                for t in tokens], expected)
+        self.assertEqual([(t.lexical_unit(), t.value, t.lineno) \
+            for t in self.lexer.get_next_token_of(list(string))], expected)
+        self.assertRaises(SyntaxWarning, self.lexer.feed, 'if ? x x x')
+        # a long number `1...1`, whose prefix `1` is a shorter number
+        self.lexer = build_lexer(number=yare.select([yare.loop_(yare.DIGIT),
+            yare.concat(['1', yare.loop(yare.LOWERCASE), '1'])]))
+        string = 'x 1%s1 7\n' % ('i' * 5000)
+        chunks = [string[i:i + 100] for i in range(0, len(string), 100)]
+        self.assertEqual([(t.lexical_unit(), t.value, t.lineno) \
+            for t in self.lexer.get_next_token_of(chunks)],
+            self.tokenize(string))
+        self.assertEqual(len(self.tokenize(string)), 3)
+    def test_error_position(self):
+        """errors report line and column of the offending input"""
+        self.lexer.set_string('if\n  x ? y')
+        tokens = self.lexer.get_next_token()
+        self.assertEqual(next(tokens).value, 'if')
+        self.assertEqual(next(tokens).value, 'x')
+        with self.assertRaises(SyntaxWarning) as context:
+            next(tokens)
+        self.assertIn('line 2, column 5', str(context.exception))
+    def test_relex(self):
+        """an edit is scanned again only until the tokens resynchronize"""
+        string = 'if x\n42 y\nz 7'
+        for offset, deleted, inserted in ((5, 2, '4'), (3, 1, 'ab'),
+            (4, 1, ' '), (0, 3, ''), (13, 0, '\n8'), (2, 0, '\n\n')):
+            self.lexer.set_string(string)
+            tokens, changed, reused = self.lexer.relex(
+                self.lexer.get_token_list(), offset, deleted, inserted)
+            edited = string[:offset] + inserted + string[offset + deleted:]
+            self.assertEqual(self.lexer.__string__, edited)
+            self.assertEqual([(t.unit, t.value, t.lineno) for t in tokens],
+                self.tokenize(edited))
+            self.assertTrue(changed <= reused <= len(tokens))
+        self.lexer.set_string(string)
+        tokens = self.lexer.get_token_list()
+        self.assertEqual(self.lexer.relex(tokens, 5, 2, '4')[1:], (2, 3))
+    def test_relex_reach(self):
+        """an edit rescans the tokens whose match read the edited input"""
+        lexer = build_comment_lexer()
+        for string, offset, inserted in (('a /* b c d * e', 12, '/'),
+            ('a /* b */ c */ d', 8, ' '), ('abc', 3, 'd'), ('abc a', 3, 'd'),
+            ('abcd', 3, ' ')):
+            lexer.set_string(string)
+            tokens, changed, reused = lexer.relex(lexer.get_token_list(),
+                offset, 0, inserted)
+            edited = string[:offset] + inserted + string[offset:]
+            lexer.set_string(edited)
+            self.assertEqual([(t.unit, t.value) for t in tokens],
+                [(t.lexical_unit(), t.value) for t in lexer.get_next_token()])
+        lexer.set_string('a /* b c d * e')
+        tokens = lexer.relex(lexer.get_token_list(), 12, 0, '/')[0]
+        self.assertEqual([t.unit for t in tokens], ['ID', 'COMMENT', 'ID'])
+    def test_positions(self):
+        """lines and columns are counted by the scanner itself"""
+        string = 'if x\n\n  42 y\nz'
+        expected = [('if', 1, 1), ('x', 1, 4), ('42', 3, 3), ('y', 3, 6),
+            ('z', 4, 1)]
+        self.lexer.set_string(string)
+        self.assertEqual([(t.value, t.lineno, t.column) \
+            for t in self.lexer.get_next_token()], expected)
+        self.assertEqual(self.lexer.lineno, 4)
+        self.lexer.set_string(memoryview(string))
+        self.assertEqual([(t.value, t.lineno, t.column) \
+            for t in self.lexer.get_next_token(compact=True)], expected)
+        self.assertEqual([(t.value, t.lineno, t.column) \
+            for t in self.lexer.get_next_token_of(list(string))], expected)
+    def test_ignore(self):
+        """ignored lexemes make no tokens and call no functions"""
+        lexer = build_ignoring_lexer()
+        lexer.set_string('x \t42#abc\n\n #d\ny')
+        self.assertEqual([(t.lexical_unit(), t.value, t.lineno, t.column) \
+            for t in lexer.get_next_token()],
+            [('ID', 'x', 1, 1), ('NUMBER', '42', 1, 4), ('ID', 'y', 4, 1)])
+        self.assertEqual(lexer.lineno, 4)
+    def test_scan(self):
+        """scanners of one lexer keep their own position and line"""
+        first = self.lexer.scan('if\nx\n\ny')
+        second = self.lexer.scan('iff\n\n\n42')
+        tokens = [first.get_next_token(), second.get_next_token()]
+        scanned = [[], []]
+        for i in (0, 1, 1, 0, 0):
+            token = next(tokens[i])
+            self.assertIs(token.lexer, (first, second)[i])
+            scanned[i].append((token.value, token.lineno))
+        self.assertEqual(scanned, [[('if', 1), ('x', 2), ('y', 4)],
+            [('iff', 1), ('42', 4)]])
+        self.assertEqual(self.lexer.lineno, 0)
+        threads = [threading.Thread(target=lambda i=i: scanned.__setitem__(
+            i, [(t.value, t.lineno) for t in self.lexer.scan(
+            'x\n' * 50 + 'if').get_next_token()])) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(scanned[0], [('x', i + 1) for i in range(50)] + \
+            [('if', 51)])
+        self.assertEqual(scanned[1], scanned[0])
+
+class TestLexerCache(unittest.TestCase):
+    """test: lex(cache_dir=...)"""
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+    def test_cache(self):
+        """an entry is written once per token specification"""
+        build_lexer(self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        lexer = build_lexer(self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        lexer.set_string('if 42')
+        self.assertEqual([t.lexical_unit() for t in lexer.get_next_token()],
+            ['IF', 'NUMBER'])
+        build_lexer(self.cache_dir, yare.loop_(yare.select(['0', '1'])))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+    def test_unpicklable(self):
+        """an entry which cannot be pickled is not written"""
+        lex.__save_cache__(self.cache_dir, 'lextab', (0,), lambda: 0)
+        lex.__save_cache__(self.cache_dir, 'lextab', (1,), threading.Lock())
+        self.assertEqual(os.listdir(self.cache_dir), [])
+    def test_yare_version(self):
+        """the version of yare in the key is looked up once"""
+        version = lex.__yare_version__()
+        self.assertIsNotNone(version)
+        self.assertIs(lex.__yare_version__(), version)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,636 @@
+#!/usr/bin/env python
+# coding:utf-8
+
+"""unit test cases for yacc.py"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import yare
+import yaly.lex as lex
+from yaly.lex import Token
+from yaly.yacc import Rule, Rules, LL1Parser, LALRParser, ParseError, yacc
+from yaly.yacc import parse_files, GrammarError, FileError
+
+GRAMMAR = (
+    "e  : t e'",
+    "e' : PLUS t e'",
+    "e' : epsilon",
+    "t  : f t'",
+    "t' : TIMES f t'",
+    "t' : epsilon",
+    "f  : LPAREN e RPAREN",
+    "f  : ID",
+)
+
+def build_rules(grammar=GRAMMAR):
+    """Rules of `grammar`, whose first rule is the start rule"""
+    rules = Rules()
+    for raw_rule in grammar:
+        rules.add(Rule(raw_rule))
+    rules.set_start_rule(Rule(grammar[0]))
+    return rules
+
+class TestRules(unittest.TestCase):
+    """test: Rules.first, Rules.follow"""
+    def test_first_follow(self):
+        """FIRST and FOLLOW sets of an LL(1) grammar"""
+        rules = build_rules()
+        self.assertEqual(rules.first("e"), frozenset(['ID', 'LPAREN']))
+        self.assertEqual(rules.first("e'"), frozenset(['PLUS', 'epsilon']))
+        self.assertEqual(rules.first(["e'", "t'"]),
+            frozenset(['PLUS', 'TIMES', 'epsilon']))
+        self.assertEqual(rules.follow("t'"),
+            frozenset(['PLUS', 'RPAREN', '$']))
+        self.assertEqual(rules.follow("f"),
+            frozenset(['PLUS', 'TIMES', 'RPAREN', '$']))
+    def test_left_recursion(self):
+        """left recursive rules reach a fixpoint"""
+        rules = build_rules(("e : e PLUS t", "e : t", "t : ID",
+            "t : LPAREN e RPAREN"))
+        self.assertEqual(rules.first("e"), frozenset(['ID', 'LPAREN']))
+        self.assertEqual(rules.follow("t"),
+            frozenset(['PLUS', 'RPAREN', '$']))
+        rules.add(Rule("t : MINUS t"))
+        self.assertEqual(rules.first("e"),
+            frozenset(['ID', 'LPAREN', 'MINUS']))
+    def test_cache(self):
+        """cached sets are only recomputed after a mutation"""
+        rules = build_rules()
+        version = rules.version()
+        self.assertIs(rules.terminals(), rules.terminals())
+        self.assertIs(rules.first("f"), rules.first("f"))
+        rules["f"].rules()
+        self.assertEqual(rules.version(), version)
+        rule = Rule("f : NUMBER")
+        rules["f"].add(rule)
+        self.assertIn('NUMBER', rules.terminals())
+        self.assertIn('NUMBER', rules.first("e"))
+        rules["f"].remove(rule)
+        self.assertNotIn('NUMBER', rules.terminals())
+        self.assertNotIn('NUMBER', rules.first("e"))
+        rule = Rule("f : NUMBER")
+        rules.add(rule)
+        rule.linsert('f')
+        self.assertIn('NUMBER', rules.follow("f"))
+        self.assertTrue(rules.version() > version)
+
+def rule_strings(rules):
+    """the rules of each nonterminal of `rules`, as a dict of string sets"""
+    return dict((lhs, set(str(rule) for rule in rules[lhs])) for lhs in rules)
+
+class TestTransforms(unittest.TestCase):
+    """test: Rules.strip_left_recr, CompleteRule.common_factor"""
+    def test_strip_left_recr(self):
+        """direct and indirect left recursions are removed"""
+        rules = build_rules(("s : q C", "s : C", "q : r B", "q : B",
+            "r : s A", "r : A"))
+        self.assertEqual(rule_strings(rules.strip_left_recr()), {
+            's': set(['s : q C', 's : C']),
+            'q': set(['q : r B', 'q : B']),
+            'r': set(["r : B C A r'", "r : C A r'", "r : A r'"]),
+            "r'": set(["r' : B C A r'", "r' : epsilon"]),
+        })
+        rules = build_rules(("e : e PLUS t", "e : t", "t : t TIMES f",
+            "t : f", "f : LPAREN e RPAREN", "f : ID"))
+        stripped = rules.strip_left_recr()
+        self.assertEqual(rule_strings(stripped), rule_strings(build_rules()))
+        self.assertEqual(stripped.start_symbol(), 'e')
+        self.assertEqual(LL1Parser(None, stripped).conflicts(), [])
+    def test_right_recursion(self):
+        """no new nonterminal is needed when the other rule is epsilon"""
+        rules = build_rules(("l : l ID", "l : l", "l : epsilon"))
+        self.assertEqual(rule_strings(rules.strip_left_recr()),
+            {'l': set(['l : ID l', 'l : epsilon'])})
+    def test_common_factor(self):
+        """rules sharing a prefix are merged"""
+        rules = build_rules(("a : A B C a", "a : A B a", "a : A a",
+            "a : B", "a : A B"))
+        factored = rules['a'].common_factor()
+        self.assertEqual([rule.lhs() for rule in factored],
+            ['a', "a'", "a''"])
+        self.assertEqual([set(str(rule) for rule in complete_rule) \
+            for complete_rule in factored], [
+            set(["a : A a'", "a : B"]),
+            set(["a' : B a''", "a' : a"]),
+            set(["a'' : C a", "a'' : a", "a'' : epsilon"]),
+        ])
+        rules = build_rules(("s  : IF ID THEN s", "s  : IF ID THEN s ELSE s",
+            "s : ID"))
+        self.assertEqual(rule_strings(rules.common_factor()), {
+            's': set(["s : IF ID THEN s s'", 's : ID']),
+            "s'": set(["s' : ELSE s", "s' : epsilon"]),
+        })
+
+class TestOptimize(unittest.TestCase):
+    """test: Rules.optimize"""
+    def test_optimize(self):
+        """useless symbols are removed and unit chains are inlined"""
+        rules = build_rules(("s : a", "s : b END", "a : LPAREN c RPAREN",
+            "a : ID", "b : b ID", "c : d", "d : s", "e : ID"))
+        messages = []
+        optimized = rules.optimize(messages.append)
+        self.assertEqual(rule_strings(optimized), {
+            's': set(['s : LPAREN s RPAREN', 's : ID']),
+        })
+        self.assertEqual(messages, [
+            'removed `b`, which derives no string',
+            'inlined `c`',
+            'inlined `d`',
+            'replaced `s : a` by the rules of `a`',
+            'removed `a`, which is not reachable',
+            'removed `e`, which is not reachable',
+        ])
+        parser = LL1Parser(WordLexer(), optimized)
+        parser.parse('LPAREN LPAREN ID RPAREN RPAREN')
+        self.assertRaises(ParseError, parser.parse, 'LPAREN ID')
+    def test_actions(self):
+        """rules with semantic actions are kept as they are"""
+        rules = Rules()
+        for rule in (Rule("s : a", lambda p: p.__setitem__(0, p[1] + '!')),
+            Rule("a : f"), Rule("f : ID", lambda p: p.__setitem__(0, p[1]))):
+            rules.add(rule)
+        rules.set_start_rule(Rule("s : a"))
+        optimized = rules.optimize()
+        self.assertEqual(rule_strings(optimized),
+            {'s': set(['s : a']), 'a': set(['a : f']), 'f': set(['f : ID'])})
+
+class WordLexer:
+    """
+    a lexer whose tokens are the whitespace separated words, lowercase
+    words and numbers are IDs
+    """
+    def __init__(self):
+        self.lineno = 1
+        self.scanned = 0
+        self.__words__ = []
+    def set_string(self, string):
+        """set input string"""
+        self.__words__ = string.split()
+        self.scanned = 0
+    def get_next_token(self):
+        """return a token stream"""
+        for word in self.__words__:
+            self.scanned += 1
+            yield Token(word if word.isupper() else 'ID', word,
+                self.lineno, self)
+
+class TestLL1Parser(unittest.TestCase):
+    """test: LL1Parser"""
+    def test_conflicts(self):
+        """conflicts are found when the table is built"""
+        self.assertEqual(LL1Parser(None, build_rules()).conflicts(), [])
+        parser = LL1Parser(WordLexer(), build_rules((
+            "s  : IF ID THEN s s'", "s  : ID", "s' : ELSE s", "s' : epsilon",
+        )))
+        symbols = parser.grammar().symbols()
+        self.assertEqual([(symbols[nonterm], symbols[term], len(cell)) \
+            for nonterm, term, cell in parser.conflicts()],
+            [("s'", 'ELSE', 2)])
+        parser.parse('IF ID THEN ID')
+        self.assertRaises(AssertionError, parser.parse,
+            'IF ID THEN ID ELSE ID')
+        self.assertRaises(ParseError, parser.parse, 'IF ID THEN THEN')
+    def test_recovery(self):
+        """all the syntax errors are collected in one parse"""
+        parser = LL1Parser(WordLexer(), build_rules())
+        for repair in (True, False):
+            value, errors = parser.parse_recovering(
+                'LPAREN ID ID RPAREN PLUS TIMES ID', repair=repair)
+            self.assertEqual([str(error) for error in errors],
+                ['unexpected ID in line 1', 'unexpected TIMES in line 1'])
+            self.assertEqual(parser.parse_recovering('ID PLUS ID'),
+                (None, []))
+            # the first error is in FOLLOW(e), where e is derived
+            value, errors = parser.parse_recovering(
+                'ID RPAREN PLUS ID TIMES TIMES ID', repair=repair)
+            self.assertEqual([str(error) for error in errors],
+                ['unexpected RPAREN in line 1', 'unexpected TIMES in line 1'])
+        errors = parser.parse_recovering('LPAREN ID PLUS ID')[1]
+        self.assertEqual([str(error) for error in errors],
+            ['RPAREN is expected in line 1 but not found'])
+        value, errors = build_calculator().parse_recovering(
+            '1 PLUS PLUS 2 TIMES LPAREN 3')
+        self.assertEqual(value, 7)
+        self.assertEqual([str(error) for error in errors],
+            ['unexpected PLUS in line 1',
+            'RPAREN is expected in line 1 but not found'])
+    def test_conflict_report(self):
+        """conflicts are reported with their witnesses and resolved"""
+        grammar = ("s  : IF ID THEN s s'", "s  : ID", "s' : ELSE s",
+            "s' : epsilon")
+        report = LL1Parser(None, build_rules(grammar)).conflict_report()
+        self.assertEqual([(c.nonterminal, c.terminal,
+            [str(rule) for rule in c.rules], c.witnesses, c.chosen) \
+            for c in report], [("s'", 'ELSE', ["s' : ELSE s", "s' : epsilon"],
+            ('FIRST', 'FOLLOW'), None)])
+        with self.assertRaises(GrammarError) as context:
+            LL1Parser(None, build_rules(grammar), strict=True)
+        self.assertEqual(len(context.exception.conflicts), 1)
+        self.assertIn("s' : epsilon  (ELSE in FOLLOW)",
+            str(context.exception))
+        parser = LL1Parser(WordLexer(), build_rules(grammar),
+            precedence=["s' :  ELSE s"], strict=True)
+        self.assertEqual(parser.conflicts(), [])
+        self.assertEqual(str(parser.conflict_report()[0].chosen),
+            "s' : ELSE s")
+        expanded = []
+        parser.parse('IF ID THEN IF ID THEN ID ELSE ID',
+            lambda event, value: expanded.append(str(value)))
+        self.assertEqual([rule for rule in expanded if rule[:2] == "s'"],
+            ["s' : ELSE s", "s' : epsilon"])
+    def test_streaming(self):
+        """tokens are scanned lazily and errors are raised early"""
+        lexer = WordLexer()
+        parser = LL1Parser(lexer, build_rules())
+        parser.parse('ID PLUS LPAREN ID TIMES ID RPAREN')
+        self.assertEqual(lexer.scanned, 7)
+        self.assertRaises(ParseError, parser.parse, 'ID ID PLUS ID PLUS ID')
+        self.assertEqual(lexer.scanned, 2)
+        self.assertRaises(ParseError, parser.parse, 'ID RPAREN')
+    def test_end_line(self):
+        """the end of the input is in the last line of its scanner"""
+        lexer = build_word_lexer()
+        for parser in (LL1Parser(lexer, build_rules()),
+            LALRParser(lexer, build_rules())):
+            for string in ('1 PLUS', '1\nPLUS\n\n'):
+                with self.assertRaises(ParseError) as context:
+                    parser.parse_tokens(lexer.scan(string).get_next_token())
+                self.assertIn('line %d' % (string.count('\n') + 1),
+                    str(context.exception))
+    def test_tracer(self):
+        """every match and expansion is reported to the tracer"""
+        events = []
+        parser = LL1Parser(WordLexer(), build_rules())
+        parser.parse('ID', lambda event, value: events.append((event,
+            value.lexical_unit() if event == 'match' else str(value))))
+        self.assertEqual(events, [
+            ('expand', "e : t e'"), ('expand', "t : f t'"),
+            ('expand', 'f : ID'), ('match', 'ID'),
+            ('expand', "t' : epsilon"), ('expand', "e' : epsilon"),
+        ])
+    def test_table(self):
+        """a dumped parsing table loads back unchanged"""
+        table = LL1Parser(None, build_rules()).dump_table()
+        loaded = LL1Parser(None, build_rules(), table)
+        self.assertEqual(loaded.dump_table(), table)
+        symbols, _, start, productions, cells = table
+        self.assertEqual(symbols[start], 'e')
+        self.assertEqual(len(productions), len(GRAMMAR))
+        self.assertIn((symbols.index('f'), symbols.index('ID'),
+            (productions.index((symbols.index('f'),
+            (symbols.index('ID'),))),)), cells)
+
+def build_calculator(lexer=None):
+    """a parser evaluating sums and products of integers"""
+    lexer = lexer or WordLexer()
+    tokens = ('PLUS', 'TIMES', 'LPAREN', 'RPAREN', 'ID')
+    grammar = (GRAMMAR[0], GRAMMAR[2], GRAMMAR[5])
+    def p_e(p):
+        "e : t e'"
+        p[0] = p[1] + p[2] if p[2] is not None else p[1]
+    def p_e_plus(p):
+        "e' : PLUS t e'"
+        p[0] = p[2] + p[3] if p[3] is not None else p[2]
+    def p_t(p):
+        """
+        t  : f t'
+        t' : TIMES f t'
+        """
+        rest = p[-1]
+        p[0] = p[-2] * rest if rest is not None else p[-2]
+    def p_f(p):
+        "f : LPAREN e RPAREN"
+        p[0] = p[2]
+    def p_f_id(p):
+        "f : ID"
+        p[0] = int(p[1])
+    return yacc()
+
+def build_alternative_calculator():
+    """build_calculator, with the alternatives of a rule on `|` lines"""
+    lexer = WordLexer()
+    tokens = ('PLUS', 'TIMES', 'LPAREN', 'RPAREN', 'ID')
+    def p_e(p):
+        """
+        e  : t e'
+        e' : PLUS t e'
+           |
+        """
+        if len(p) == 3:
+            p[0] = p[1] + p[2] if p[2] is not None else p[1]
+        elif len(p) == 4:
+            p[0] = p[2] + p[3] if p[3] is not None else p[2]
+    def p_t(p):
+        """
+        t  : f t'
+        t' : TIMES f t'
+           | epsilon
+        """
+        if len(p) > 2:
+            rest = p[-1]
+            p[0] = p[-2] * rest if rest is not None else p[-2]
+    def p_f(p):
+        """
+        f : LPAREN e RPAREN
+          | ID
+        """
+        p[0] = p[2] if len(p) == 4 else int(p[1])
+    return yacc()
+
+class TestActions(unittest.TestCase):
+    """test: semantic actions"""
+    def test_calculator(self):
+        """values are synthesized bottom up"""
+        parser = build_calculator()
+        self.assertEqual(parser.parse('2 TIMES LPAREN 3 PLUS 4 RPAREN'), 14)
+        self.assertEqual(parser.parse('1 PLUS 2 TIMES 3 TIMES 4'), 25)
+    def test_alternatives(self):
+        """`|` lines add alternatives of the rule above them"""
+        parser = build_alternative_calculator()
+        self.assertEqual(parser.parse('2 TIMES LPAREN 3 PLUS 4 RPAREN'), 14)
+        self.assertEqual(parser.parse('1 PLUS 2 TIMES 3 TIMES 4'), 25)
+        def build():
+            """an alternative without a rule above it"""
+            lexer = WordLexer()
+            tokens = ('ID',)
+            def p_bad(p):
+                """
+                | ID
+                """
+            return yacc()
+        self.assertRaises(SyntaxError, build)
+    def test_duplicate(self):
+        """a rule cannot have two actions"""
+        def build():
+            """two actions of `f : ID`"""
+            lexer = WordLexer()
+            tokens = ('ID',)
+            def p_f(p):
+                "f : ID"
+            def p_g(p):
+                """
+                f : ID ID
+                  | ID
+                """
+            return yacc()
+        self.assertRaises(SyntaxError, build)
+
+def build_cached_parser(cache_dir, action):
+    """an optimized parser of `s : a`, `a : ID`, with an action or not"""
+    lexer = WordLexer()
+    tokens = ('ID',)
+    if action:
+        grammar = ('s : a',)
+        def p_a(p):
+            "a : ID"
+            p[0] = p[1]
+    else:
+        grammar = ('s : a', 'a : ID')
+    return yacc(cache_dir, optimize=True)
+
+class TestParserCache(unittest.TestCase):
+    """test: yacc(cache_dir=...)"""
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+    def test_actions(self):
+        """moving a rule into an action makes another table"""
+        for action in (False, True, False, True):
+            build_cached_parser(self.cache_dir, action).parse('x')
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+    def test_stale(self):
+        """a cached table which does not fit the rules is built again"""
+        load = lex.__load_cache__
+        lex.__load_cache__ = lambda *args: \
+            LL1Parser(None, build_rules()).dump_table()
+        try:
+            build_cached_parser(self.cache_dir, True).parse('x')
+        finally:
+            lex.__load_cache__ = load
+
+def build_word_lexer(convert=False):
+    """
+    a yaly lexer of the words of WordLexer, IDs are numbers, which are
+    converted to int if `convert` is true
+    """
+    tokens = ('PLUS', 'TIMES', 'LPAREN', 'RPAREN', 'ID', 'SPACE')
+    t_PLUS = yare.concat(list('PLUS'))
+    t_TIMES = yare.concat(list('TIMES'))
+    t_LPAREN = yare.concat(list('LPAREN'))
+    t_RPAREN = yare.concat(list('RPAREN'))
+    if convert:
+        def t_ID(t):
+            t.value = int(t.value)
+            return t
+        t_ID.__doc__ = yare.loop_(yare.DIGIT)
+    else:
+        t_ID = yare.loop_(yare.DIGIT)
+    def t_SPACE(t):
+        t.lexer.lineno += t.value.count('\n')
+        t.skip = True
+        return t
+    t_SPACE.__doc__ = yare.loop_(yare.select([' ', '\n']))
+    return lex.lex()
+
+def build_sum_parser():
+    """a parser of sums of the numbers converted by the lexer"""
+    lexer = build_word_lexer(convert=True)
+    tokens = ('PLUS', 'ID')
+    def p_s(p):
+        "s : ID r"
+        p[0] = p[1] + p[2]
+    def p_r(p):
+        """
+        r : PLUS ID r
+          |
+        """
+        p[0] = p[2] + p[3] if len(p) > 2 else 0
+    return yacc()
+
+class TestIncrementalParse(unittest.TestCase):
+    """test: LL1Parser.parse_incremental"""
+    EDITS = ((0, 1, '12'), (2, 0, ' TIMES 3'), (26, 4, 'TIMES'),
+        (9, 0, 'LPAREN 1 PLUS '), (32, 0, ' RPAREN'), (8, 0, '\n\n'),
+        (48, 0, ' PLUS'), (48, 5, ''))
+    def check(self, parser, string):
+        """apply EDITS one after the other, comparing with a full parse"""
+        session = parser.parse_incremental(string, interval=2)
+        for offset, deleted, inserted in self.EDITS:
+            string = string[:offset] + inserted + string[offset + deleted:]
+            try:
+                expected = parser.parse(string)
+            except ParseError:
+                self.assertRaises(ParseError, session.edit,
+                    offset, deleted, inserted)
+            else:
+                self.assertEqual(session.edit(offset, deleted, inserted),
+                    expected)
+                self.assertEqual(session.result(), expected)
+            self.assertEqual(session.string(), string)
+            parser.__lexer__.set_string(string)
+            self.assertEqual(list(session.tokens()),
+                list(parser.__lexer__.get_token_list()))
+    def test_edits(self):
+        """edited inputs parse as they would from scratch"""
+        string = ' PLUS '.join(['1 TIMES 2 PLUS 3'] * 8)
+        self.check(LL1Parser(build_word_lexer(), build_rules()), string)
+        self.check(build_calculator(build_word_lexer()), string)
+    def test_resync(self):
+        """without actions the parse stops once its state meets the old"""
+        parser = LL1Parser(build_word_lexer(), build_rules())
+        run = parser.__run__
+        matched = []
+        def counting_run(tokens, stack, values, tracer, checkpoint):
+            """count the tokens matched by the parse"""
+            def counting(stack, values):
+                """count a matched token"""
+                matched.append(values)
+                return checkpoint(stack, values)
+            return run(tokens, stack, values, tracer, counting)
+        parser.__run__ = counting_run
+        for interval in (4, 64):
+            session = parser.parse_incremental(
+                ' PLUS '.join(['1 TIMES 2'] * 50), interval=interval)
+            count = 50 * 4 - 1
+            # the edits change the number of tokens by 0, +2, -2 and +4
+            for offset, deleted, inserted, change in ((0, 1, '7', 0),
+                (1, 0, ' TIMES 3', 2), (1, 8, '', -2),
+                (1, 0, ' TIMES 3 TIMES 4', 4)):
+                del matched[:]
+                session.edit(offset, deleted, inserted)
+                count += change
+                self.assertTrue(len(matched) <= interval + 8)
+                self.assertEqual(len(session.tokens()), count)
+            del matched[:]
+            session.edit(len(session.string()), 0, ' PLUS 5')
+            self.assertTrue(len(matched) <= interval + 8)
+            self.assertRaises(ParseError, session.edit, 1, 0, ' PLUS')
+            session.edit(1, 5, '')
+            self.assertEqual(list(session.tokens()), list(LL1Parser(
+                build_word_lexer(), build_rules()).parse_incremental(
+                session.string()).tokens()))
+    def test_values(self):
+        """the values set by the functions of the tokens are kept"""
+        parser = build_sum_parser()
+        session = parser.parse_incremental('1 PLUS 20 PLUS 3', interval=2)
+        self.assertEqual(session.result(), 24)
+        self.assertEqual(session.edit(0, 1, '100'), 123)
+        self.assertEqual(session.edit(len(session.string()), 0, ' PLUS 7'),
+            130)
+        self.assertEqual([t.value for t in session.tokens()],
+            [100, 'PLUS', 20, 'PLUS', 3, 'PLUS', 7])
+        self.assertEqual(session.result(), parser.parse(session.string()))
+
+def build_file_calculator():
+    """a calculator scanning files, for parse_files"""
+    return build_calculator(build_word_lexer())
+
+def build_failing_calculator():
+    """a calculator whose action fails on the IDs 0 and 9"""
+    lexer = build_word_lexer()
+    tokens = ('PLUS', 'TIMES', 'LPAREN', 'RPAREN', 'ID')
+    grammar = GRAMMAR[:-1]
+    class LocalError(Exception):
+        """an exception which cannot be pickled"""
+        pass
+    def p_f_id(p):
+        "f : ID"
+        if p[1] == '9':
+            raise LocalError('nine')
+        p[0] = 1 / int(p[1])
+    return yacc()
+
+class TestParseFiles(unittest.TestCase):
+    """test: parse_files"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    def test_parse_files(self):
+        """every file gets its value or its error"""
+        paths = []
+        for i, string in enumerate(['1 PLUS 2', '2 TIMES 3 TIMES 4',
+            'LPAREN 1', '1 ? 2'] * 3):
+            paths.append(os.path.join(self.directory, '%d.txt' % i))
+            with open(paths[-1], 'w') as f:
+                f.write(string)
+        paths.append(os.path.join(self.directory, 'missing.txt'))
+        for workers in (1, 2):
+            results = parse_files(build_file_calculator, paths, workers)
+            self.assertEqual([r.path for r in results], paths)
+            self.assertEqual([r.value for r in results[:4]],
+                [3, 24, None, None])
+            self.assertEqual([type(r.error) for r in results[:4]],
+                [type(None), type(None), ParseError, SyntaxWarning])
+            self.assertIsInstance(results[-1].error, EnvironmentError)
+    def test_action_errors(self):
+        """any exception of a file is kept, the other files are parsed"""
+        paths = []
+        for i, string in enumerate(['1 PLUS 2', '0', '9', '2']):
+            paths.append(os.path.join(self.directory, '%d.txt' % i))
+            with open(paths[-1], 'w') as f:
+                f.write(string)
+        for workers in (1, 2):
+            results = parse_files(build_failing_calculator, paths, workers)
+            self.assertEqual([r.error for r in results[::3]], [None, None])
+            self.assertIsInstance(results[1].error, ZeroDivisionError)
+            self.assertIn('LocalError: nine' if workers > 1 else 'nine',
+                str(results[2].error))
+        self.assertIsInstance(results[2].error, FileError)
+
+def build_lalr_calculator():
+    """a LALR parser of a left recursive grammar of sums and products"""
+    lexer = WordLexer()
+    tokens = ('PLUS', 'TIMES', 'LPAREN', 'RPAREN', 'ID')
+    def p_e_plus(p):
+        "e : e PLUS t"
+        p[0] = p[1] + p[3]
+    def p_e(p):
+        """
+        e : t
+        t : f
+        """
+        p[0] = p[1]
+    def p_t_times(p):
+        "t : t TIMES f"
+        p[0] = p[1] * p[3]
+    def p_f(p):
+        "f : LPAREN e RPAREN"
+        p[0] = p[2]
+    def p_f_id(p):
+        "f : ID"
+        p[0] = int(p[1])
+    return yacc(method='LALR')
+
+class TestLALRParser(unittest.TestCase):
+    """test: LALRParser"""
+    def test_calculator(self):
+        """left recursive rules reduce left to right"""
+        parser = build_lalr_calculator()
+        self.assertEqual(parser.conflicts(), [])
+        self.assertEqual(parser.parse('2 TIMES LPAREN 3 PLUS 4 RPAREN'), 14)
+        self.assertEqual(parser.parse('1 PLUS 2 TIMES 3 PLUS 4'), 11)
+        self.assertRaises(ParseError, parser.parse, '1 PLUS PLUS 2')
+    def test_epsilon(self):
+        """epsilon rules reduce on their lookaheads"""
+        parser = LALRParser(WordLexer(), build_rules())
+        self.assertEqual(parser.conflicts(), [])
+        parser.parse('ID PLUS LPAREN ID TIMES ID RPAREN')
+        self.assertRaises(ParseError, parser.parse, 'ID RPAREN')
+        table = parser.dump_table()
+        self.assertEqual(
+            LALRParser(WordLexer(), build_rules(), table).dump_table(), table)
+    def test_conflicts(self):
+        """conflicts are kept in the dumped table"""
+        rules = build_rules(('s : IF ID THEN s e', 's : ID', 'e : ELSE s',
+            'e : epsilon'))
+        parser = LALRParser(WordLexer(), rules)
+        self.assertEqual(parser.conflicts(), [('shift/reduce', 6, 'ELSE')])
+        loaded = LALRParser(WordLexer(), rules, parser.dump_table())
+        self.assertEqual(loaded.conflicts(), parser.conflicts())
+
+if __name__ == '__main__':
+    unittest.main()
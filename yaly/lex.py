@@ -3,12 +3,111 @@
 
 """lexical analysis"""
 
-class Token:
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import imap
+
+try:
+    __BUFFER__ = buffer
+except NameError:
+    __BUFFER__ = None
+
+def __text__(source, start, end):
+    """the characters of `source` from `start` to `end` as a string"""
+    text = source[start:end]
+    return text if isinstance(text, basestring) else text.tobytes()
+
+def __find__(source, char, start, end):
+    """index of `char` in `source[start:end]`, or -1"""
+    if hasattr(source, 'find'):
+        return source.find(char, start, end)
+    for i in xrange(start, min(end, len(source))):
+        if source[i] == char:
+            return i
+    return -1
+
+def __count__(source, char, start, end):
+    """number of `char` in `source[start:end]`"""
+    if hasattr(source, 'count'):
+        return source.count(char, start, end)
+    return __text__(source, start, end).count(char)
+
+def __rfind__(source, char, start, end):
+    """index of the last `char` in `source[start:end]`, or -1"""
+    if hasattr(source, 'rfind'):
+        return source.rfind(char, start, end)
+    for i in xrange(end - 1, start - 1, -1):
+        if source[i] == char:
+            return i
+    return -1
+
+class __View__(object):
+    """
+    the characters of `source` from `start` on, for the matcher, without
+    copying them; used for the inputs which have no zero-copy buffer,
+    i.e. unicode strings, and to find out how far the matcher read, see
+    `reach`
+    """
+    __slots__ = ('__source__', '__start__', '__reach__', '__indices__')
+    def __init__(self, source, start):
+        self.__source__ = source
+        self.__start__ = start
+        self.__reach__ = start
+        self.__indices__ = None # offsets left to the last iterator
+    def __len__(self):
+        return len(self.__source__) - self.__start__
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            self.__reach__ = max(self.__reach__,
+                self.__start__ + stop if step == 1 and stop < len(self) \
+                else len(self.__source__) + 1)
+            return self.__source__[self.__start__ + start:
+                self.__start__ + stop:step]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            self.__reach__ = len(self.__source__) + 1
+            raise IndexError('view index out of range')
+        self.__reach__ = max(self.__reach__, self.__start__ + i + 1)
+        return self.__source__[self.__start__ + i]
+    def __iter__(self):
+        self.reach()
+        self.__indices__ = iter(xrange(self.__start__, len(self.__source__)))
+        return imap(self.__source__.__getitem__, self.__indices__)
+    def reach(self):
+        """
+        the offset in `source` after the last character read so far, or
+        `len(source) + 1` if the reader went up to the end of `source`
+        """
+        if self.__indices__ is not None:
+            self.__reach__ = max(self.__reach__,
+                next(self.__indices__, len(self.__source__) + 1))
+            self.__indices__ = None
+        return self.__reach__
+
+# format version of the files written by lex(cache_dir=...)
+__LEXTAB_VERSION__ = 1
+
+# tokens per block of a TokenList
+__BLOCK_SIZE__ = 128
+# the value of a token of a TokenList whose value is its lexeme
+__LEXEME__ = object()
+
+# lexemes longer than this are not memoized by Lexer.__classify__
+__MEMO_MAX__ = 64
+# the memo of Lexer.__classify__ is cleared once it holds more lexemes
+__MEMO_SIZE__ = 4096
+
+class Token(object):
     """
     A token is a string of one or more characters that is significant
     as a group.
     """
-    def __init__(self, lexical_unit, value, lineno, lexer):
+    __slots__ = ('__lexical_unit__', '__raw__', 'skip', 'value', 'lexer',
+        'lineno', 'column')
+    def __init__(self, lexical_unit, value, lineno, lexer, column=0):
         assert type(lexical_unit) == str
         self.__lexical_unit__ = lexical_unit
         self.__raw__ = value
@@ -16,6 +115,7 @@ class Token:
         self.value = value
         self.lexer = lexer
         self.lineno = lineno
+        self.column = column
     def __str__(self):
         return "<%s, %s, line %d>" % \
             (self.__lexical_unit__, repr(self.value), self.lineno)
@@ -23,64 +123,614 @@ class Token:
         """getter : __lexical_unit__"""
         return self.__lexical_unit__
 
-class Lexer:
-    """Lexer performs lexical analysis"""
-    def __init__(self, tokens, raw_tokens, regex):
-        """
-        `tokens` is a dict map token name (i.e. lexical unit) to a tuple,
-        of which the first position is a compiled regular expression
-        (type: pyre.RegEx) and the second one is the function
+class CompactToken(namedtuple('CompactToken',
+    'unit start end lineno source')):
+    """
+    a token as a plain tuple of its lexical unit (the token name, which
+    is shared with the lexer), the offsets of its lexeme in the input, its
+    line and the input itself; the lexeme is only sliced out of the input
+    when `value` is accessed
+    """
+    __slots__ = ()
+    def __str__(self):
+        return "<%s, %s, line %d>" % \
+            (self.unit, repr(self.value), self.lineno)
+    @property
+    def value(self):
+        """the lexeme"""
+        return __text__(self.source, self.start, self.end)
+    @property
+    def column(self):
+        """the column (counted from 1) of the lexeme"""
+        return self.start - __rfind__(self.source, '\n', 0, self.start)
+    def lexical_unit(self):
+        """getter : unit"""
+        return self.unit
 
-        `raw_tokens` is an iterable object which contains all tokens name
-        and the order in it is the precedence of each token
+class TokenColumns(object):
+    """
+    the tokens of an input as parallel arrays of machine integers: the
+    id of the lexical unit (an index in `names`), the start and end
+    offsets of the lexeme and the line; a token takes a few dozen bytes
+    instead of an object, and `columns[i]` makes a CompactToken of it
+    """
+    __slots__ = ('names', 'units', 'starts', 'ends', 'lines', 'source')
+    def __init__(self, names, source):
+        self.names = names
+        self.units = array('H')
+        self.starts = array('l')
+        self.ends = array('l')
+        self.lines = array('l')
+        self.source = source
+    def __len__(self):
+        return len(self.units)
+    def __getitem__(self, i):
+        return CompactToken(self.names[self.units[i]], self.starts[i],
+            self.ends[i], self.lines[i], self.source)
+    def unit(self, i):
+        """the lexical unit of the `i`th token"""
+        return self.names[self.units[i]]
 
-        `regex` is a compiled RegEx object which accepts all valid
-        string
+class SpanToken(namedtuple('SpanToken', 'unit start end lineno value')):
+    """
+    a token of a TokenList as a plain tuple of its lexical unit, the
+    offsets of its lexeme in the input, its line and its value, which is
+    the lexeme unless the function of the token changed it
+    """
+    __slots__ = ()
+    def __str__(self):
+        return "<%s, %s, line %d>" % \
+            (self.unit, repr(self.value), self.lineno)
+    def lexical_unit(self):
+        """getter : unit"""
+        return self.unit
+
+def __shift__(span, delta, line_delta):
+    """the token tuple `span` moved by `delta` characters and lines"""
+    unit, start, end, lineno, value, reach = span
+    return unit, start + delta, end + delta, lineno + line_delta, value, \
+        reach + delta
+
+class TokenList(object):
+    """
+    the tokens of an input, kept up to date through its edits by
+    `Scanner.relex`; `tokens[i]` and iterating make SpanToken's
+
+    the tokens are stored in blocks of tuples `(unit, start, end, lineno,
+    value, reach)` whose offsets and lines are relative to the offset
+    and line of their block; `value` is __LEXEME__ unless the function of
+    the token changed it, and `reach` is the offset after the last
+    character read to match the token and the ignored input before it;
+    an edit rebuilds the blocks it touches and only moves the later ones,
+    and the lexemes are sliced out of `source` when the tokens are read
+    """
+    __slots__ = ('source', '__blocks__', '__firsts__')
+    def __init__(self, source, spans=()):
+        self.source = source
+        self.__blocks__ = [] # [offset, line, tuples, largest reach]
+        self.__firsts__ = [] # index of the first token of each block
+        self.__splice__(0, 0, spans, 0, 0)
+    def __len__(self):
+        if not self.__blocks__:
+            return 0
+        return self.__firsts__[-1] + len(self.__blocks__[-1][2])
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('token index out of range')
+        return self.__token__(self.__span__(i))
+    def __iter__(self):
+        return self.iterate(0)
+    def iterate(self, start):
+        """generate the tokens from the `start`th one on"""
+        firsts = self.__firsts__
+        for k in xrange(max(bisect_right(firsts, start) - 1, 0),
+            len(self.__blocks__)):
+            offset, line, rels, _ = self.__blocks__[k]
+            for rel in rels[max(start - firsts[k], 0):]:
+                yield self.__token__(__shift__(rel, offset, line))
+    def __token__(self, span):
+        """the SpanToken of the tuple `span`"""
+        unit, start, end, lineno, value, _ = span
+        if value is __LEXEME__:
+            value = __text__(self.source, start, end)
+        return SpanToken(unit, start, end, lineno, value)
+    def __span__(self, i):
+        """the tuple of the `i`th token"""
+        k = bisect_right(self.__firsts__, i) - 1
+        offset, line, rels, _ = self.__blocks__[k]
+        return __shift__(rels[i - self.__firsts__[k]], offset, line)
+    def __reaching__(self, offset):
         """
-        self.__tokens__ = tokens
-        self.__raw_tokens__ = raw_tokens
+        index of the first token whose match read the character at
+        `offset` or after it, or the number of tokens
+        """
+        for k, (base, _, rels, top) in enumerate(self.__blocks__):
+            if base + top > offset:
+                for i, rel in enumerate(rels):
+                    if base + rel[5] > offset:
+                        return self.__firsts__[k] + i
+        return len(self)
+    def __splice__(self, i, j, spans, delta, line_delta):
+        """
+        replace the tokens from the `i`th to before the `j`th by the
+        tuples `spans`, and move the tokens after them by `delta`
+        characters and `line_delta` lines
+        """
+        blocks, firsts = self.__blocks__, self.__firsts__
+        # the blocks from `low` to before `high` are built again
+        low = max(bisect_right(firsts, i) - 1, 0)
+        high = max(bisect_right(firsts, j - 1), low + 1) if blocks else 0
+        old = []
+        for offset, line, rels, _ in blocks[low:high]:
+            old.extend(__shift__(rel, offset, line) for rel in rels)
+        first = firsts[low] if blocks else 0
+        middle = old[:i - first] + list(spans) + \
+            [__shift__(span, delta, line_delta) for span in old[j - first:]]
+        if len(middle) < __BLOCK_SIZE__ // 2 and high < len(blocks):
+            offset, line, rels, _ = blocks[high]
+            middle.extend(__shift__(rel, offset + delta, line + line_delta) \
+                for rel in rels)
+            high += 1
+        count = -(-len(middle) // __BLOCK_SIZE__)
+        size = -(-len(middle) // count) if count else 1
+        rebuilt = []
+        for n in xrange(0, len(middle), size):
+            chunk = middle[n:n + size]
+            offset, line = chunk[0][1], chunk[0][3]
+            rels = [__shift__(span, -offset, -line) for span in chunk]
+            rebuilt.append([offset, line, rels, max(rel[5] for rel in rels)])
+        for block in blocks[high:]:
+            block[0] += delta
+            block[1] += line_delta
+        blocks[low:high] = rebuilt
+        del firsts[:]
+        total = 0
+        for block in blocks:
+            firsts.append(total)
+            total += len(block[2])
+
+class Scanner:
+    """
+    a scan of an input by a Lexer: the position in the input and the line
+    number, which the functions of the tokens may update through
+    `t.lexer`; see `Lexer.scan`
+    """
+    def __init__(self, lexer):
+        self.__lexer__ = lexer
         self.__string__ = None
-        self.__re__ = regex
+        self.__pos__ = 0
+        self.__feeding__ = False # whether the input is pushed by `feed`
+        # the lines are counted by the scanner up to `__line_pos__`, where
+        # the line is `__line__` and starts at `__line_start__`
+        self.__line__ = 0
+        self.__line_pos__ = 0
+        self.__line_start__ = 0
         self.lineno = 0
-    def get_next_token(self):
+    def __remaining__(self):
+        """
+        the unconsumed input starting at the current position; a
+        zero-copy buffer or memoryview is used for byte inputs and a
+        __View__ for unicode strings, so scanning never copies the tail
+        of the input
+        """
+        string = self.__string__
+        if self.__pos__ == 0:
+            return string
+        if isinstance(string, unicode):
+            return __View__(string, self.__pos__)
+        if __BUFFER__ is not None and not isinstance(string, memoryview):
+            return __BUFFER__(string, self.__pos__)
+        return string[self.__pos__:]
+    def column(self):
+        """column (counted from 1) of the current position"""
+        return self.__pos__ - __rfind__(self.__string__, '\n', 0, self.__pos__)
+    def __seek__(self, pos, lineno):
+        """move to `pos`, which is in the line `lineno`"""
+        self.__pos__ = self.__line_pos__ = pos
+        self.__line__ = self.lineno = lineno
+        self.__line_start__ = __rfind__(self.__string__, '\n', 0, pos) + 1
+    def __count_lines__(self, pos):
+        """
+        count the lines up to `pos`, which is not before the position
+        they were last counted to, and set `lineno`, overwriting whatever
+        the functions of the tokens did to it
+        """
+        string = self.__string__
+        newlines = __count__(string, '\n', self.__line_pos__, pos)
+        if newlines:
+            self.__line__ += newlines
+            self.__line_start__ = \
+                __rfind__(string, '\n', self.__line_pos__, pos) + 1
+        self.__line_pos__ = pos
+        self.lineno = self.__line__
+    def get_next_token(self, compact=False):
         """
         return a token(type: Token) stream
+
+        if `compact` is true, CompactToken's are yielded instead; the
+        functions of the tokens are still called, so they can skip tokens
+        or count lines, but their changes to the value are not kept
+        """
+        if self.__string__ is None:
+            raise UserWarning('having not specify input string')
+        return self.__scan__(compact)
+    def get_token_columns(self):
+        """
+        return all the remaining tokens as a TokenColumns, which stores
+        them in arrays instead of objects; see `get_next_token`
         """
         if self.__string__ is None:
             raise UserWarning('having not specify input string')
-        while self.__string__:
-            next_idx = self.__re__.match_prefix(self.__string__)
+        lexer = self.__lexer__
+        columns = TokenColumns(lexer.__raw_tokens__, self.__string__)
+        ids = lexer.__unit_ids__
+        units, starts, ends, lines = columns.units, columns.starts, \
+            columns.ends, columns.lines
+        for token in self.__scan__(True):
+            units.append(ids[token.unit])
+            starts.append(token.start)
+            ends.append(token.end)
+            lines.append(token.lineno)
+        return columns
+    def get_token_list(self):
+        """
+        return all the remaining tokens as a TokenList, which `relex`
+        keeps up to date when the input is edited; unlike compact tokens,
+        the values set by the functions of the tokens are kept
+        """
+        if self.__string__ is None:
+            raise UserWarning('having not specify input string')
+        return TokenList(self.__string__, self.__scan__(True, spans=True))
+    def __scan__(self, compact, partial=False, spans=False):
+        """
+        generate the tokens of the input from the current position, see
+        `get_next_token`; if `partial` is true, more input may follow, so
+        stop before the first lexeme whose match read up to the end of
+        the input, since the rest of the input could change it
+
+        if `spans` is true, the tuples of a TokenList are generated
+        """
+        lexer = self.__lexer__
+        string = self.__string__
+        reach = 0
+        while self.__pos__ < len(string):
+            pos = self.__pos__
+            if partial or spans:
+                view = __View__(string, pos)
+                next_idx = lexer.__re__.match_prefix(view)
+                reach = max(reach, view.reach())
+                if partial and reach > len(string):
+                    return
+            else:
+                next_idx = lexer.__re__.match_prefix(self.__remaining__())
             if not next_idx:
-                raise SyntaxWarning("remaining `%s` cannot be parsed" % \
-                    self.__string__)
-            lexeme = self.__string__[:next_idx]
-            self.__string__ = self.__string__[next_idx:]
-            found = False
-            for token in self.__raw_tokens__:
-                assert token in self.__tokens__
-                if self.__tokens__[token][0].match(lexeme):
-                    found = True
-                    next_token = self.__tokens__[token][1](
-                        Token(token, lexeme, self.lineno, self)
-                    )
-                    if next_token.skip:
-                        continue
+                self.__count_lines__(pos)
+                end = __find__(string, '\n', pos, pos + 20)
+                raise SyntaxWarning(
+                    "`%s` in line %d, column %d cannot be parsed" % \
+                    (__text__(string, pos, end if end >= 0 else pos + 20),
+                    self.lineno, self.column())
+                )
+            lexeme = __text__(string, pos, pos + next_idx)
+            self.__pos__ = pos + next_idx
+            token = lexer.__classify__(lexeme)
+            if token in lexer.__ignored__:
+                continue
+            self.__count_lines__(pos)
+            lineno = self.lineno
+            func = lexer.__tokens__[token][1]
+            value = __LEXEME__
+            if func is not None:
+                next_token = func(Token(token, lexeme, lineno, self,
+                    pos - self.__line_start__ + 1))
+                if next_token.skip:
+                    continue
+                if spans:
+                    token = next_token.lexical_unit()
+                    if next_token.value is not lexeme:
+                        value = next_token.value
+                elif not compact:
                     yield next_token
-                    break
-            if not found:
-                raise AssertionError("lexeme `%s` is valid " % lexeme  + \
-                    "but not found the corresponding lexical unit" )
+                    continue
+            if spans:
+                yield token, pos, pos + next_idx, lineno, value, reach
+                reach = 0
+            elif compact:
+                yield CompactToken(token, pos, pos + next_idx, lineno, string)
+            else:
+                yield Token(token, lexeme, lineno, self,
+                    pos - self.__line_start__ + 1)
+        if not partial:
+            self.__count_lines__(len(string))
     def set_string(self, string):
-        """set input string"""
+        """
+        set input string, which may also be any object that can be
+        sliced and indexed like a string, such as a memoryview, a buffer
+        or an mmap; it is scanned in place
+        """
         self.__string__ = string
-        self.lineno = 1
+        self.__feeding__ = False
+        self.__seek__(0, 1)
+    def feed(self, chunk):
+        """
+        push a chunk of input, and return the list of the tokens which
+        are complete; a token is held back until its match stops before
+        the end of the input pushed so far (or the input is closed), so
+        the longest match is found whatever the length of the lexemes
+
+        the input is ended by `close`, after which `feed` starts a new
+        input
+        """
+        if not self.__feeding__:
+            self.set_string('')
+            self.__feeding__ = True
+        pos = self.__pos__
+        self.__count_lines__(pos)
+        self.__string__ = __text__(self.__string__, pos,
+            len(self.__string__)) + chunk
+        self.__pos__ = self.__line_pos__ = 0
+        self.__line_start__ -= pos
+        return list(self.__scan__(False, True))
+    def close(self):
+        """end the input pushed by `feed`, return its remaining tokens"""
+        if not self.__feeding__:
+            return []
+        tokens = list(self.__scan__(False))
+        self.__string__ = None
+        self.__feeding__ = False
+        return tokens
+    def get_next_token_of(self, chunks):
+        """
+        return a token(type: Token) stream of the input given as an
+        iterable of chunks, such as a file or a socket reader
+        """
+        self.__feeding__ = False
+        for chunk in chunks:
+            for token in self.feed(chunk):
+                yield token
+        for token in self.close():
+            yield token
+    def relex(self, tokens, offset, deleted, inserted):
+        """
+        edit the input, replacing `deleted` characters at `offset` by the
+        string `inserted`, and update its tokens
+
+        `tokens` is the TokenList of the input before the edit, see
+        `get_token_list`, which is updated in place; scanning restarts
+        after the last token whose match read nothing from `offset` on,
+        and stops as soon as a token after the edit starts and ends where
+        an old token did, the rest of the old tokens are then only
+        shifted
+
+        return `(tokens, changed, reused)`: the tokens of the edited
+        input, the index of the first one which was scanned again and
+        the index from which they equal the old ones
+        """
+        string = self.__string__
+        new_string = __text__(string, 0, offset) + inserted + \
+            __text__(string, offset + deleted, len(string))
+        delta = len(inserted) - deleted
+        changed = tokens.__reaching__(offset)
+        self.set_string(new_string)
+        if changed:
+            _, start, end, lineno, _, _ = tokens.__span__(changed - 1)
+            self.__seek__(end,
+                lineno + __count__(new_string, '\n', start, end))
+        spans = []
+        old = changed
+        for span in self.__scan__(True, spans=True):
+            spans.append(span)
+            if span[1] < offset + len(inserted):
+                continue
+            while old < len(tokens) and \
+                tokens.__span__(old)[1] < span[1] - delta:
+                old += 1
+            if old < len(tokens):
+                unit, start, end, lineno, _, _ = tokens.__span__(old)
+                if (unit, start + delta, end + delta) == span[:3]:
+                    tokens.source = new_string
+                    tokens.__splice__(changed, old + 1, spans, delta,
+                        span[3] - lineno)
+                    return tokens, changed, changed + len(spans) - 1
+        tokens.source = new_string
+        tokens.__splice__(changed, len(tokens), spans, 0, 0)
+        return tokens, changed, len(tokens)
+    def set_file(self, path):
+        """
+        set input to the content of the file `path`, which is mapped in
+        memory and scanned in place instead of being read into a string
+        """
+        import mmap
+        with open(path, 'rb') as f:
+            try:
+                string = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError: # an empty file cannot be mapped
+                string = ''
+        self.set_string(string)
+
+class Lexer(Scanner):
+    """
+    Lexer performs lexical analysis
+
+    it only holds the compiled regular expressions of the tokens, which
+    are shared by all the scanners returned by `scan`, so one Lexer can
+    scan many inputs at once, from many threads; a Lexer is also the
+    scanner of the input given by its own `set_string`
+    """
+    def __init__(self, tokens, raw_tokens, regex, ignored=frozenset()):
+        """
+        `tokens` is a dict map token name (i.e. lexical unit) to a tuple,
+        of which the first position is a compiled regular expression
+        (type: pyre.RegEx) and the second one is the function, or None if
+        the token has no function
+
+        `raw_tokens` is an iterable object which contains all tokens name
+        and the order in it is the precedence of each token
+
+        `regex` is a compiled RegEx object which accepts all valid
+        string
+
+        `ignored` is the set of the tokens whose lexemes are consumed
+        without making a Token nor calling a function
+        """
+        Scanner.__init__(self, self)
+        self.__tokens__ = tokens
+        self.__raw_tokens__ = tuple(raw_tokens)
+        self.__unit_ids__ = dict((token, i) \
+            for i, token in enumerate(self.__raw_tokens__))
+        self.__re__ = regex
+        self.__ignored__ = ignored
+        self.__units__ = {}
+    def scan(self, string=None):
+        """
+        return a new Scanner of `string`, or of the input given later to
+        its `set_string`, `feed` or `set_file`; it shares the compiled
+        regular expressions of this lexer but has its own position and
+        line number
+        """
+        scanner = Scanner(self)
+        if string is not None:
+            scanner.set_string(string)
+        return scanner
+    def __classify__(self, lexeme):
+        """
+        return the lexical unit of `lexeme`, i.e. the token of highest
+        precedence whose regular expression matches it
+
+        the result only depends on the lexeme, so short lexemes (which
+        covers keywords, operators and most identifiers) are memoized and
+        each of them is matched against the token regexs only once; the
+        memo is cleared when it grows past `__MEMO_SIZE__`, so that a
+        long-lived lexer does not keep every identifier it has seen
+        """
+        # one lookup, since another thread may clear the memo meanwhile
+        unit = self.__units__.get(lexeme)
+        if unit is not None:
+            return unit
+        for token in self.__raw_tokens__:
+            assert token in self.__tokens__
+            if self.__tokens__[token][0].match(lexeme):
+                if len(lexeme) <= __MEMO_MAX__:
+                    if len(self.__units__) >= __MEMO_SIZE__:
+                        self.__units__.clear()
+                    self.__units__[lexeme] = token
+                return token
+        raise AssertionError("lexeme `%s` is valid " % lexeme  + \
+            "but not found the corresponding lexical unit" )
+
+def __compile_tokens__(specs):
+    """
+    compile `specs`, a tuple of (token, regex) pairs, into a dict map
+    token name to compiled RegEx and a RegEx which accepts all of them
+    """
+    import yare
+    compiled = {}
+    for token, regex in specs:
+        try:
+            compiled[token] = yare.compile(regex)
+        except SyntaxError, e:
+            raise SyntaxError(
+                'regular expression `%s` specified' % regex + \
+                'in function `t_%s` not valid. Detail: %s' % (token, e)
+            )
+    return compiled, yare.compile(yare.select([r for _, r in specs]))
+
+def __cache_path__(cache_dir, name, key):
+    """cache file of `key` in `cache_dir`"""
+    import hashlib
+    import os.path
+    return os.path.join(cache_dir,
+        '%s-%s.pickle' % (name, hashlib.sha1(repr(key)).hexdigest()))
 
-def lex():
+def __load_cache__(cache_dir, name, key):
+    """
+    return the value cached for `key` (which should contain a format
+    version), or None if there is no valid cache entry
+    """
+    try:
+        import cPickle as pickle
+    except ImportError:
+        import pickle
+    try:
+        with open(__cache_path__(cache_dir, name, key), 'rb') as f:
+            cached_key, value = pickle.load(f)
+    except Exception: # missing, truncated or written by another version
+        return None
+    if cached_key != key:
+        return None
+    return value
+
+def __save_cache__(cache_dir, name, key, value):
+    """
+    write a cache entry, silently giving up if it cannot be written or
+    `value` cannot be pickled
+    """
+    try:
+        import cPickle as pickle
+    except ImportError:
+        import pickle
+    import os
+    import tempfile
+    tmp = None
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((key, value), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, __cache_path__(cache_dir, name, key))
+    except (IOError, OSError, TypeError, AttributeError,
+        pickle.PicklingError):
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+
+# the version of yare found by __yare_version__, once it is looked up
+__YARE_VERSION__ = None
+
+def __yare_version__():
+    """
+    version of the installed yare, whose compiled objects are cached:
+    its `__version__`, or else the path, size and modification time of
+    its source file
+    """
+    global __YARE_VERSION__
+    if __YARE_VERSION__ is None:
+        import os
+        import yare
+        version = getattr(yare, '__version__', None)
+        if version is None:
+            path = yare.__file__
+            if path.endswith(('.pyc', '.pyo')) and os.path.exists(path[:-1]):
+                path = path[:-1]
+            stat = os.stat(path)
+            version = (path, stat.st_size, stat.st_mtime)
+        __YARE_VERSION__ = version
+    return __YARE_VERSION__
+
+# the lexical unit of the characters of `t_ignore`
+__IGNORE__ = 'ignore'
+
+def lex(cache_dir=None):
     """
     return a Lexer
+
+    the lexemes of the tokens listed in the optional variable
+    `ignore_tokens` are consumed without making a Token, and their
+    functions, if any, are never called; the optional variable
+    `t_ignore` is a string of characters, runs of which are ignored
+    between the tokens, as if matched by an ignored token of the lowest
+    precedence
+
+    `cache_dir` is an optional directory in which the compiled regular
+    expressions are cached, keyed by a hash of the ordered token names
+    and regexs; a later call with the same specification loads them
+    instead of compiling them again, and changing any regex invalidates
+    the entry
     """
-    compiled_tokens = {}
-    regexs = []
+    funcs = {}
+    plain = set() # tokens defined by a string instead of a function
     import sys
     all_vars = sys._getframe(1).f_locals
     if 'tokens' not in all_vars:
@@ -113,13 +763,33 @@ def lex():
             all_vars[func_name] = lambda t : t
             all_vars[func_name].__doc__ = func
             func = all_vars[func_name]
-        import yare
-        try:
-            compiled_tokens[token] = (yare.compile(func.__doc__), func)
-        except SyntaxError, e:
-            raise SyntaxError(
-                'regular expression `%s` specified' % func.__doc__ + \
-                'in function `%s` not valid. Detail: %s' % (func_name, e)
+            plain.add(token)
+        funcs[token] = func
+    ignored = set(all_vars.get('ignore_tokens', ()))
+    for token in ignored:
+        if token not in funcs:
+            raise NameError(
+                'ignored token `%s` not declared in `tokens`' % token
             )
-        regexs.append(func.__doc__)
-    return Lexer(compiled_tokens, tokens, yare.compile(yare.select(regexs)))
+    specs = tuple((token, funcs[token].__doc__) for token in tokens)
+    raw_tokens = tuple(tokens)
+    if all_vars.get('t_ignore'):
+        import yare
+        specs += ((__IGNORE__, yare.loop_(yare.select(
+            [yare.escape(char) for char in all_vars['t_ignore']]))),)
+        raw_tokens += (__IGNORE__,)
+        ignored.add(__IGNORE__)
+        plain.add(__IGNORE__)
+        funcs[__IGNORE__] = None
+    cached = None
+    if cache_dir:
+        key = (__LEXTAB_VERSION__, __yare_version__(), specs)
+        cached = __load_cache__(cache_dir, 'lextab', key)
+    if cached is None:
+        cached = __compile_tokens__(specs)
+        if cache_dir:
+            __save_cache__(cache_dir, 'lextab', key, cached)
+    compiled, regex = cached
+    compiled_tokens = dict((token, (compiled[token],
+        None if token in plain else funcs[token])) for token in raw_tokens)
+    return Lexer(compiled_tokens, raw_tokens, regex, frozenset(ignored))
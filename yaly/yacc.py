@@ -3,11 +3,20 @@
 
 """syntax analysis"""
 
+from collections import namedtuple
+
 import lex
 
 __EPSILON__ = 'epsilon'
 __END__ = '$'
 
+# sentinels of the LL(1) parsing table
+__ERROR__ = -1
+__CONFLICT__ = -2
+
+# format version of the tables written by yacc(cache_dir=...)
+__PARSETAB_VERSION__ = 3
+
 class Rule:
     """
     a single rule for a nonterminal, and maybe this nonterminal
@@ -37,6 +46,10 @@ class Rule:
                 'terminals in rules should be uppercase, ' + \
                 'while nonterminals in rules should be lowercase'
             )
+        self.__owner__ = None # CompleteRule
+        self.__update_terms__()
+    def __update_terms__(self):
+        """recompute the terminals and nonterminals of this rule"""
         self.__nonterminals__ = { self.__lhs__ }
         self.__terminals__ = set()
         for _id in self.__rhs__:
@@ -44,6 +57,11 @@ class Rule:
                 self.__nonterminals__.add(_id)
             else:
                 self.__terminals__.add(_id)
+    def __touch__(self):
+        """called after this rule is mutated"""
+        self.__update_terms__()
+        if self.__owner__ is not None:
+            self.__owner__.__touch__()
     def __str__(self):
         return ' '.join([self.__lhs__, ':'] + self.__rhs__)
     def __eq__(self, other):
@@ -52,7 +70,7 @@ class Rule:
     def __ne__(self, other):
         return not self.__eq__(other)
     def __hash__(self):
-        return self.__str__().__hash__()
+        return hash((self.__lhs__, tuple(self.__rhs__)))
     @staticmethod
     def epsilon(lhs, func):
         """make an epsilon Rule"""
@@ -81,9 +99,16 @@ class Rule:
     def lhs(self):
         """getter : lhs nonterminal in this rule"""
         return self.__lhs__
+    def func(self):
+        """getter : semantic action of this rule"""
+        return self.__func__
+    def set_func(self, func):
+        """setter : semantic action of this rule"""
+        self.__func__ = func
     def change_lhs(self, lhs):
         """setter : lhs nonterminal in this rule"""
         self.__lhs__ = lhs
+        self.__touch__()
     def rhs(self):
         """getter : list of rhs identifiers in this rule"""
         return self.__rhs__
@@ -91,18 +116,23 @@ class Rule:
         """insert a term in the rightmost position of rhs"""
         assert type(term) == str and Rule.is_valid_term(term)
         self.__rhs__.append(term)
+        self.__touch__()
     def linsert(self, term):
         """insert a term in the leftmost position of rhs"""
         assert type(term) == str and Rule.is_valid_term(term)
         self.__rhs__.insert(0, term)
+        self.__touch__()
     def rremove(self):
         """remove a term in the rightmost position of rhs"""
         assert self.__rhs__
-        return self.__rhs__.pop()
+        term = self.__rhs__.pop()
+        self.__touch__()
+        return term
     def lremove(self):
         """remove a term in the leftmost position of rhs"""
         assert self.__rhs__
         self.__rhs__.remove(self.__rhs__[0])
+        self.__touch__()
 
 class CompleteRule:
     """a grammar rule for a nonterminal"""
@@ -111,8 +141,7 @@ class CompleteRule:
         self.__rules__ = set()
         self.__terminals__ = set()
         self.__nonterminals__ = { self.__lhs__ }
-        self.__first__ = set()
-        self.__follow__ = set()
+        self.__owner__ = None # Rules
     def __iter__(self):
         return self.__rules__.__iter__()
     def __eq__(self, other):
@@ -123,7 +152,7 @@ class CompleteRule:
     def __str__(self):
         return ' | '.join([rule.__str__() for rule in self.__rules__])
     def __hash__(self):
-        return self.__str__().__hash__()
+        return hash((self.__lhs__, frozenset(self.__rules__)))
     def add(self, rule):
         """add a rule"""
         if rule.lhs() != self.__lhs__:
@@ -132,16 +161,26 @@ class CompleteRule:
                 (rule.lhs(), self.__lhs__)
             )
         self.__rules__.add(rule)
-        self.__terminals__.update(rule.terminals())
-        self.__nonterminals__.update(rule.nonterminals())
-        self.__first__ = set()
-        self.__follow__ = set()
+        rule.__owner__ = self
+        self.__touch__()
         return self
+    def __touch__(self):
+        """called after this rule or one of its rules is mutated"""
+        self.__terminals__ = None
+        self.__nonterminals__ = None
+        if self.__owner__ is not None:
+            self.__owner__.__touch__()
     def terminals(self):
         """getter : terminals in all rules"""
+        if self.__terminals__ is None:
+            self.__terminals__ = set().union(
+                *[rule.terminals() for rule in self])
         return self.__terminals__
     def nonterminals(self):
         """getter : nonterminals in all rules"""
+        if self.__nonterminals__ is None:
+            self.__nonterminals__ = set([self.__lhs__]).union(
+                *[rule.nonterminals() for rule in self])
         return self.__nonterminals__
     def lhs(self):
         """getter : lhs nonterminal in all rules"""
@@ -152,51 +191,114 @@ class CompleteRule:
     def remove(self, rule):
         """remove a rule"""
         self.__rules__.remove(rule)
-        self.__first__ = set()
-        self.__follow__ = set()
+        self.__touch__()
     def first(self, rules):
         """return FIRST set of term"""
-        if not self.__first__:
-            first_set = set()
-            for rule in self:
-                if rule.is_epsilon():
-                    first_set.add(__EPSILON__)
-                else:
-                    rule_rhs = rule.rhs()
-                    end = True
-                    for term in rule_rhs:
-                        first_set.update(rules.first(term))
-                        if __EPSILON__ not in rules.first(term):
-                            end = False
-                            break
-                    if end:
-                        first_set.add(__EPSILON__)
-            self.__first__ = first_set
-        return self.__first__
+        return rules.first(self.__lhs__)
+    def common_factor(self):
+        """
+        return the CompleteRule's of this nonterminal left factored: the
+        rules sharing a prefix become one rule, the prefix followed by a
+        new nonterminal (named after this one with primes) whose rules are
+        the different suffixes, so that no two rules of a nonterminal
+        begin with the same symbol
+
+        the rules are read once into a trie, so this is linear in their
+        total length; a rule left unchanged keeps its semantic action
+        """
+        names = set(self.__owner__.nonterminals()) \
+            if self.__owner__ is not None else set([self.__lhs__])
+        factored = {}
+        order = []
+        for lhs, rhs, func in __left_factor__(self.__lhs__,
+            __alternatives__(self), names):
+            if lhs not in factored:
+                factored[lhs] = CompleteRule(lhs)
+                order.append(lhs)
+            factored[lhs].add(Rule((lhs, list(rhs) or [__EPSILON__]), func))
+        return [factored[lhs] for lhs in order]
+
+def __alternatives__(complete_rule):
+    """
+    the rules of `complete_rule` as `(rhs, func)` pairs, in a stable
+    order, where `rhs` is a tuple without epsilon
+    """
+    return [(tuple(term for term in rule.rhs() if term != __EPSILON__),
+        rule.func()) for rule in sorted(complete_rule, key=str)]
+
+def __fresh_name__(names, lhs):
+    """a nonterminal named `lhs` followed by primes which is not in `names`"""
+    name = lhs + "'"
+    while name in names:
+        name += "'"
+    names.add(name)
+    return name
+
+def __left_factor__(lhs, alternatives, names):
+    """
+    left factor the `(rhs, func)` pairs `alternatives` of `lhs`, see
+    `CompleteRule.common_factor`; return a list of `(lhs, rhs, func)`
+    """
+    # a trie node is [children by symbol, symbols in order, (rhs, func)
+    # of the rule ending there or None]
+    root = [{}, [], None]
+    for rhs, func in alternatives:
+        node = root
+        for term in rhs:
+            if term not in node[0]:
+                node[0][term] = [{}, [], None]
+                node[1].append(term)
+            node = node[0][term]
+        if node[2] is None:
+            node[2] = (rhs, func)
+    productions = []
+    work = [(lhs, root)]
+    while work:
+        head, node = work.pop(0)
+        if node[2] is not None:
+            productions.append((head, (),
+                node[2][1] if head == lhs else None))
+        for term in node[1]:
+            # follow the prefix shared by all the rules under `term`
+            prefix = [term]
+            child = node[0][term]
+            while child[2] is None and len(child[1]) == 1:
+                prefix.append(child[1][0])
+                child = child[0][child[1][0]]
+            if not child[1]:
+                rhs, func = child[2]
+                productions.append((head, tuple(prefix),
+                    func if head == lhs and tuple(prefix) == rhs else None))
+            else:
+                helper = __fresh_name__(names, lhs)
+                productions.append((head, tuple(prefix) + (helper,), None))
+                work.append((helper, child))
+    return productions
 
 class Rules:
-    """a container of all CompleteRule's"""
+    """
+    a container of all CompleteRule's
+
+    the symbol sets and FIRST/FOLLOW sets are cached until the rules are
+    mutated, which is tracked by a version counter
+    """
     def __init__(self):
         self.__rules__ = {}
-        self.__terminals__ = set()
-        self.__nonterminals__ = set()
         self.__start__ = None # CompleteRule
-        self.__follows__ = {}
+        self.__version__ = 0
+        self.__cache__ = {} # name -> (version, value)
     def __getitem__(self, lhs):
-        self.__terminals__ = None
-        self.__nonterminals__ = None
         return self.__rules__[lhs]
     def __setitem__(self, lhs, complete_rule):
         if not complete_rule:
             complete_rule = CompleteRule(lhs)
         self.__rules__[lhs] = complete_rule
-        self.__terminals__ = self.terminals().\
-            update(complete_rule.terminals())
-        self.__nonterminals__ = self.nonterminals().\
-            update(complete_rule.nonterminals())
+        complete_rule.__owner__ = self
+        self.__touch__()
         return self
     def __delitem__(self, key):
         del self.__rules__[key]
+        self.__touch__()
     def __len__(self):
         return len(self.__rules__)
     def __iter__(self):
@@ -205,6 +307,19 @@ class Rules:
         return '\n'.join([self[lhs].__str__() for lhs in self])
     def __hash__(self):
         return self.__str__().__hash__()
+    def __touch__(self):
+        """called after the rules are mutated"""
+        self.__version__ += 1
+    def __cached__(self, name, compute):
+        """value of `compute()`, cached until the rules are mutated"""
+        entry = self.__cache__.get(name)
+        if entry is None or entry[0] != self.__version__:
+            entry = self.__version__, compute()
+            self.__cache__[name] = entry
+        return entry[1]
+    def version(self):
+        """getter : version counter, increased by every mutation"""
+        return self.__version__
     def is_start(self, term):
         """check whether the term is a start symbol"""
         if not self.__start__:
@@ -218,163 +333,1143 @@ class Rules:
     def set_start_rule(self, rule):
         """setter : start symbol"""
         self.__start__ = self[rule.lhs()]
+        self.__touch__()
     def terminals(self):
         """getter : terminals in all rules"""
-        if not self.__terminals__:
-            self.__terminals__ = reduce(lambda x, y : x.union(y),
-                [self[lhs].terminals() for lhs in self],
-                set())
-        return self.__terminals__
+        return self.__cached__('terminals', lambda: set().union(
+            *[self[lhs].terminals() for lhs in self]))
     def nonterminals(self):
         """getter : nonterminals in all rules"""
-        if not self.__nonterminals__:
-            self.__nonterminals__ = reduce(lambda x, y : x.union(y),
-                [self[lhs].nonterminals() for lhs in self],
-                set())
-        return self.__nonterminals__
+        return self.__cached__('nonterminals', lambda: set().union(
+            *[self[lhs].nonterminals() for lhs in self]))
     def setdefault(self, lhs):
         """set default map value of lhs"""
-        self.__rules__.setdefault(lhs, CompleteRule(lhs))
+        if lhs not in self.__rules__:
+            self[lhs] = CompleteRule(lhs)
     def add(self, rule):
         """add a new Rule"""
         lhs = rule.lhs()
         self.setdefault(lhs)
         self[lhs].add(rule)
+    def __analyze__(self):
+        """
+        compute FIRST and FOLLOW sets of all nonterminals by worklist
+        fixpoint iteration, where a set of terminals is a bitset (int)
+        over the terminal indices
+
+        return the terminals, a function computing the FIRST bitset of a
+        sequence, and the FIRST and FOLLOW sets of all nonterminals
+        """
+        terms = sorted(self.terminals() - set([__EPSILON__])) + \
+            [__END__, __EPSILON__]
+        bits = dict((term, 1 << i) for i, term in enumerate(terms))
+        epsilon = bits[__EPSILON__]
+        first = dict((nonterm, 0) for nonterm in self.nonterminals())
+        prods = [(rule.lhs(), [term for term in rule.rhs() \
+            if term != __EPSILON__]) for lhs in self for rule in self[lhs]]
+        def first_of(rhs):
+            """FIRST bitset of the symbols `rhs`"""
+            result = 0
+            for term in rhs:
+                term_bits = first[term] if term in first else bits[term]
+                result |= term_bits & ~epsilon
+                if not term_bits & epsilon:
+                    return result
+            return result | epsilon
+        users = {}
+        for lhs, rhs in prods:
+            for term in rhs:
+                if term in first:
+                    users.setdefault(term, set()).add(lhs)
+        work = list(self)
+        queued = set(work)
+        while work:
+            lhs = work.pop()
+            queued.remove(lhs)
+            new_first = 0
+            for rule in self[lhs]:
+                new_first |= first_of([term for term in rule.rhs() \
+                    if term != __EPSILON__])
+            if new_first != first[lhs]:
+                first[lhs] = new_first
+                for user in users.get(lhs, ()):
+                    if user not in queued:
+                        queued.add(user)
+                        work.append(user)
+        follow = dict((nonterm, 0) for nonterm in first)
+        if self.__start__:
+            follow[self.start_symbol()] = bits[__END__]
+        # FOLLOW(lhs) flows into FOLLOW(term) along an edge lhs -> term
+        edges = {}
+        for lhs, rhs in prods:
+            for i, term in enumerate(rhs):
+                if term in first:
+                    rest = first_of(rhs[i + 1:])
+                    follow[term] |= rest & ~epsilon
+                    if rest & epsilon and term != lhs:
+                        edges.setdefault(lhs, set()).add(term)
+        work = list(follow)
+        queued = set(work)
+        while work:
+            lhs = work.pop()
+            queued.remove(lhs)
+            for term in edges.get(lhs, ()):
+                if follow[lhs] & ~follow[term]:
+                    follow[term] |= follow[lhs]
+                    if term not in queued:
+                        queued.add(term)
+                        work.append(term)
+        return (terms, first_of,
+            dict((nonterm, self.__decode__(terms, first[nonterm])) \
+                for nonterm in first),
+            dict((nonterm, self.__decode__(terms, follow[nonterm])) \
+                for nonterm in follow))
+    @staticmethod
+    def __decode__(terms, term_bits):
+        """the frozenset of the terminals in bitset `term_bits`"""
+        return frozenset(term for i, term in enumerate(terms) \
+            if term_bits >> i & 1)
     def first(self, term):
-        """return FIRST set of term"""
+        """
+        return FIRST set of term, or of a sequence of terms, as a
+        frozenset shared by all callers
+        """
         if type(term) == tuple or type(term) == list:
-            if not term:
-                return set()
-            if Rule.is_nonterminal(term[0]) and \
-                __EPSILON__ in self.first(term[0]):
-                return self.first(term[0]).union(self.first(term[1:]))
-            else:
-                return self.first(term[0])
+            terms, first_of = self.__cached__('analysis', self.__analyze__)[:2]
+            return self.__decode__(terms,
+                first_of([t for t in term if t != __EPSILON__]))
         if Rule.is_terminal(term):
-            return { term }
-        import copy
-        return copy.deepcopy(self[term].first(self))
+            return frozenset([term])
+        return self.__cached__('analysis', self.__analyze__)[2][term]
     def follows(self):
         """calculate FOLLOW sets of all nonterminals"""
         assert self.__start__
-        new_follows = {}
-        for term in self:
-            new_follows.setdefault(term, set())
-            self.__follows__.setdefault(term, set())
-        new_follows[self.start_symbol()].add(__END__)
-        for nonterm in self:
-            com_rule = self[nonterm]
-            for rule in com_rule:
-                rule_rhs = rule.rhs()
-                for i, term in enumerate(rule_rhs):
-                    if Rule.is_terminal(term):
-                        continue
-                    j = i+1
-                    while j < len(rule_rhs):
-                        end = True
-                        first_beta = self.first(rule_rhs[j])
-                        if __EPSILON__ in first_beta:
-                            end = False
-                            first_beta.remove(__EPSILON__)
-                        new_follows[term].update(first_beta)
-                        if end:
-                            break
-                        else:
-                            j += 1
-                    if j == len(rule_rhs):
-                        new_follows[term].update(self.__follows__[rule.lhs()])
-        return new_follows
+        return dict(self.__cached__('analysis', self.__analyze__)[3])
     def follow(self, term):
-        """return FOLLOW set of term"""
+        """return FOLLOW set of term, as a frozenset shared by all callers"""
         assert Rule.is_nonterminal(term)
-        if not self.__follows__:
-            new_follows = self.follows()
-            while new_follows != self.__follows__:
-                self.__follows__ = new_follows
-                new_follows = self.follows()
-        import copy
-        return copy.deepcopy(self.__follows__[term])
+        return self.__cached__('analysis', self.__analyze__)[3][term]
+    def __order__(self):
+        """the nonterminals with rules, the start symbol first"""
+        start = self.start_symbol()
+        return sorted(self, key=lambda lhs: (lhs != start, lhs))
+    def __derive__(self, productions):
+        """
+        new Rules of the `(lhs, rhs, func)` list `productions`, with the
+        same start symbol
+        """
+        rules = Rules()
+        for lhs, rhs, func in productions:
+            rules.add(Rule((lhs, list(rhs) or [__EPSILON__]), func))
+        if self.__start__ is not None:
+            rules.set_start_rule(Rule.epsilon(self.start_symbol(), None))
+        return rules
+    def common_factor(self):
+        """
+        return new Rules where every nonterminal is left factored, see
+        `CompleteRule.common_factor`
+        """
+        names = set(self.nonterminals())
+        productions = []
+        for lhs in self.__order__():
+            productions += __left_factor__(lhs,
+                __alternatives__(self[lhs]), names)
+        return self.__derive__(productions)
+    def strip_left_recr(self):
+        """
+        return new Rules without left recursion, direct or indirect
+
+        the nonterminals are ordered, the start symbol first; the rules
+        of each one which begin with a preceding nonterminal are expanded
+        by the rules of the latter, but only if it can derive a string
+        beginning with the former, as no other expansion is needed and
+        each one multiplies the rules; then a direct left recursion
+        `a : a x | y` is turned into `a : y a'`, `a' : x a' | epsilon`,
+        or into `a : x a | epsilon` if `y` is epsilon, and `a : a` is
+        dropped
+
+        like the usual algorithm, this assumes that no nonterminal derives
+        epsilon through a left recursion; the expanded rules and the new
+        ones have no semantic action
+        """
+        order = self.__order__()
+        names = set(self.nonterminals())
+        prods = dict((lhs, __alternatives__(self[lhs])) for lhs in order)
+        def left_reaches(source, target):
+            """whether `source` derives a string beginning with `target`"""
+            seen = set([source])
+            work = [source]
+            while work:
+                for rhs, _ in prods.get(work.pop(), ()):
+                    if rhs and rhs[0] == target:
+                        return True
+                    if rhs and rhs[0] in prods and rhs[0] not in seen:
+                        seen.add(rhs[0])
+                        work.append(rhs[0])
+            return False
+        helpers = []
+        for i, lhs in enumerate(order):
+            for other in order[:i]:
+                if not any(rhs[:1] == (other,) for rhs, _ in prods[lhs]) \
+                    or not left_reaches(other, lhs):
+                    continue
+                expanded = []
+                for rhs, func in prods[lhs]:
+                    if rhs[:1] == (other,):
+                        expanded += [(delta + rhs[1:], None) \
+                            for delta, _ in prods[other]]
+                    else:
+                        expanded.append((rhs, func))
+                seen = set()
+                prods[lhs] = [(rhs, func) for rhs, func in expanded \
+                    if rhs not in seen and not seen.add(rhs)]
+            alphas = [rhs[1:] for rhs, _ in prods[lhs] \
+                if rhs[:1] == (lhs,) and rhs[1:]]
+            others = [(rhs, func) for rhs, func in prods[lhs] \
+                if rhs[:1] != (lhs,)]
+            if not alphas:
+                prods[lhs] = others
+            elif [rhs for rhs, _ in others] == [()]:
+                prods[lhs] = [(alpha + (lhs,), None) for alpha in alphas] + \
+                    others
+            else:
+                helper = __fresh_name__(names, lhs)
+                helpers.append(helper)
+                prods[lhs] = [(beta + (helper,), None) for beta, _ in others]
+                prods[helper] = [(alpha + (helper,), None) \
+                    for alpha in alphas] + [((), None)]
+        return self.__derive__([(lhs, rhs, func) \
+            for lhs in order + helpers for rhs, func in prods[lhs]])
+    def optimize(self, reporter=None):
+        """
+        return new Rules of the same language which take fewer derivation
+        steps, and so fewer expansions at parse time
+
+        - the nonterminals which derive no string of terminals, and the
+          rules using them, are removed
+        - a nonterminal with a single rule, which is not recursive, is
+          replaced by the rhs of that rule wherever it is used
+        - a unit rule `a : b` is replaced by the rules of `b`
+        - the nonterminals which are not reachable from the start symbol
+          are removed
+
+        the rules with a semantic action are neither replaced nor
+        rewritten, so the values they see are unchanged; an LL(1) grammar
+        stays LL(1); `reporter` is an optional callable which is called
+        with a message for every change
+        """
+        report = reporter or (lambda message: None)
+        start = self.start_symbol()
+        order = self.__order__()
+        prods = dict((lhs, __alternatives__(self[lhs])) for lhs in order)
+        def is_plain(lhs):
+            """whether no rule of `lhs` has a semantic action"""
+            return all(func is None for _, func in prods[lhs])
+        generating = set()
+        changed = True
+        while changed:
+            changed = False
+            for lhs in order:
+                if lhs not in generating and any(all(term in generating \
+                    or Rule.is_terminal(term) for term in rhs) \
+                    for rhs, _ in prods[lhs]):
+                    generating.add(lhs)
+                    changed = True
+        if start is not None and start not in generating:
+            raise ValueError('start symbol `%s` derives no string' % start)
+        for lhs in order:
+            if lhs not in generating:
+                report('removed `%s`, which derives no string' % lhs)
+                del prods[lhs]
+            else:
+                prods[lhs] = [(rhs, func) for rhs, func in prods[lhs] \
+                    if all(term in generating or Rule.is_terminal(term) \
+                    for term in rhs)]
+        order = [lhs for lhs in order if lhs in prods]
+        changed = True
+        while changed:
+            changed = False
+            for single in order:
+                if single == start or single not in prods or \
+                    len(prods[single]) != 1 or not is_plain(single) or \
+                    single in prods[single][0][0]:
+                    continue
+                body = prods[single][0][0]
+                kept = inlined = False
+                for lhs in prods:
+                    result = []
+                    for rhs, func in prods[lhs]:
+                        if single in rhs and func is None:
+                            rhs = sum([body if term == single else (term,) \
+                                for term in rhs], ())
+                            inlined = True
+                        kept = kept or single in rhs
+                        result.append((rhs, func))
+                    prods[lhs] = result
+                if inlined:
+                    report('inlined `%s`' % single)
+                    changed = True
+                if inlined and not kept:
+                    del prods[single]
+        collapsing = set()
+        def collapse(lhs):
+            """replace the unit rules of `lhs`, those of `b` first"""
+            collapsing.add(lhs)
+            result = []
+            for rhs, func in prods[lhs]:
+                target = rhs[0] if len(rhs) == 1 else None
+                if func is None and target in prods and \
+                    target not in collapsing and is_plain(target):
+                    collapse(target)
+                    report('replaced `%s : %s` by the rules of `%s`' % \
+                        (lhs, target, target))
+                    result += prods[target]
+                else:
+                    result.append((rhs, func))
+            seen = set()
+            prods[lhs] = [(rhs, func) for rhs, func in result \
+                if (rhs, func) not in seen and not seen.add((rhs, func))]
+            collapsing.remove(lhs)
+        order = [lhs for lhs in order if lhs in prods]
+        for lhs in order:
+            collapse(lhs)
+        reachable = set([start])
+        work = [start]
+        while work:
+            for rhs, _ in prods.get(work.pop(), ()):
+                for term in rhs:
+                    if term in prods and term not in reachable:
+                        reachable.add(term)
+                        work.append(term)
+        for lhs in order:
+            if lhs in prods and lhs not in reachable:
+                report('removed `%s`, which is not reachable' % lhs)
+                del prods[lhs]
+        return self.__derive__([(lhs, rhs, func) \
+            for lhs in order if lhs in prods for rhs, func in prods[lhs]])
 
 class ParseError(Exception):
     """parse error exception"""
     pass
 
+class GrammarError(Exception):
+    """
+    grammar error exception, raised by a strict LL1Parser whose table has
+    conflicts; `conflicts` is the list of the Conflict's
+    """
+    def __init__(self, conflicts):
+        Exception.__init__(self, '\n'.join(str(c) for c in conflicts))
+        self.conflicts = conflicts
+
+class Conflict(namedtuple('Conflict',
+    'nonterminal terminal rules witnesses chosen')):
+    """
+    a conflicting cell of an LL(1) parsing table: every Rule of `rules`
+    expands `nonterminal` on the lookahead `terminal`; the witness of each
+    rule is 'FIRST' if `terminal` begins its rhs, or 'FOLLOW' if its rhs
+    derives epsilon and `terminal` follows `nonterminal`; `chosen` is the
+    rule chosen by precedence, or None if the conflict is not resolved
+    """
+    __slots__ = ()
+    def __str__(self):
+        lines = ['conflict of `%s` on %s%s:' % (self.nonterminal,
+            self.terminal, '' if self.chosen is None else ', resolved')]
+        for rule, witness in zip(self.rules, self.witnesses):
+            lines.append('    %s %s  (%s in %s)' % ('*' if rule is \
+                self.chosen else ' ', rule, self.terminal, witness))
+        return '\n'.join(lines)
+
+def __lookahead__(lexer, tokens, last=None):
+    """
+    next token of the stream `tokens` of `lexer`, or the end marker
+
+    the line of the end marker is taken from the token `last` before it:
+    the line at the end of the input of its scanner if it is a Token, or
+    its own line for a compact token; `lexer` is only used for an empty
+    stream, since the tokens may come from another scanner of it
+    """
+    token = next(tokens, None)
+    if token is not None:
+        return token
+    if isinstance(last, lex.Token):
+        lexer = last.lexer
+    lineno = last.lineno if last is not None and \
+        not isinstance(last, lex.Token) else lexer.lineno
+    return lex.Token(__END__, __END__, lineno, lexer)
+
+class Grammar(object):
+    """
+    a frozen form of Rules in which every symbol is interned to an
+    integer: the nonterminals are numbered from 0, followed by the
+    terminals and the end marker, and a production is a pair of the lhs
+    id and the tuple of rhs ids, in which epsilon is dropped
+    """
+    __slots__ = ('__symbols__', '__ids__', '__nonterminal_count__',
+        '__start__', '__productions__', '__rules__')
+    def __init__(self, symbols, nonterminal_count, start, productions,
+        rules):
+        """
+        `symbols` is a tuple of all symbol names, of which the first
+        `nonterminal_count` ones are nonterminals, `start` is the id of
+        the start symbol, `productions` a tuple of (lhs, rhs) and `rules`
+        a tuple of the Rule of each production
+        """
+        self.__symbols__ = symbols
+        self.__ids__ = dict((symbol, i) for i, symbol in enumerate(symbols))
+        self.__nonterminal_count__ = nonterminal_count
+        self.__start__ = start
+        self.__productions__ = productions
+        self.__rules__ = rules
+    @staticmethod
+    def compile(rules):
+        """make the Grammar of a Rules"""
+        nonterms = sorted(rules.nonterminals())
+        symbols = tuple(nonterms) + tuple(sorted(rules.terminals() - \
+            set([__EPSILON__]))) + (__END__,)
+        ids = dict((symbol, i) for i, symbol in enumerate(symbols))
+        rule_list = tuple(rule for nonterm in sorted(rules) \
+            for rule in sorted(rules[nonterm], key=str))
+        productions = tuple((ids[rule.lhs()], tuple(ids[term] \
+            for term in rule.rhs() if term != __EPSILON__)) \
+            for rule in rule_list)
+        return Grammar(symbols, len(nonterms), ids[rules.start_symbol()],
+            productions, rule_list)
+    @staticmethod
+    def load(rules, symbols, nonterminal_count, start, productions):
+        """
+        make a Grammar from the parts returned by `dump`, binding its
+        productions to the equal rules of a Rules
+        """
+        rule_map = {}
+        for nonterm in rules:
+            for rule in rules[nonterm]:
+                rule_map[rule.lhs(), tuple(term for term in rule.rhs() \
+                    if term != __EPSILON__)] = rule
+        rule_list = tuple(rule_map[symbols[lhs],
+            tuple(symbols[term] for term in rhs)] \
+            for lhs, rhs in productions)
+        return Grammar(symbols, nonterminal_count, start, productions,
+            rule_list)
+    def dump(self):
+        """
+        return `(symbols, nonterminal_count, start, productions)`, which
+        can be given to `load` with the same rules
+        """
+        return self.__symbols__, self.__nonterminal_count__, \
+            self.__start__, self.__productions__
+    def symbols(self):
+        """getter : names of all symbols, indexed by their ids"""
+        return self.__symbols__
+    def ids(self):
+        """getter : dict map symbol names to their ids"""
+        return self.__ids__
+    def nonterminal_count(self):
+        """getter : number of nonterminals, whose ids come first"""
+        return self.__nonterminal_count__
+    def start(self):
+        """getter : id of the start symbol"""
+        return self.__start__
+    def end(self):
+        """getter : id of the end marker"""
+        return len(self.__symbols__) - 1
+    def productions(self):
+        """getter : all productions as (lhs, rhs) ids"""
+        return self.__productions__
+    def rule(self, production):
+        """getter : the Rule of a production"""
+        return self.__rules__[production]
+    def has_actions(self):
+        """whether any rule has a semantic action"""
+        return any(rule.func() is not None for rule in self.__rules__)
+
 class LL1Parser:
     """a defined LL(1) CFG Parser"""
-    def __init__(self, lexer, rules):
+    def __init__(self, lexer, rules, table=None, precedence=(),
+        strict=False):
         """
-        `rules` is a Rules
+        `rules` is a Rules, which is compiled into a Grammar
+
+        `table` is an optional parsing table of the same rules returned
+        by `dump_table`; if it is given, the FIRST and FOLLOW sets are not
+        computed at all
+
+        `precedence` is a sequence of rules, as strings, from the highest
+        precedence to the lowest; a conflict between rules of which some
+        are declared is resolved in favor of the first declared one
+
+        if `strict` is true, GrammarError is raised if conflicts are left;
+        otherwise the parse fails if it reaches one, see `conflict_report`
         """
         self.__lexer__ = lexer
         self.__rules__ = rules
-        self.__parsing_table__ = {}
-        for nonterm in self.__rules__.nonterminals():
-            self.__parsing_table__.setdefault(nonterm, {})
-            self.__parsing_table__[nonterm].setdefault(__END__, set())
-            for term in self.__rules__.terminals():
-                self.__parsing_table__[nonterm].setdefault(term, set())
-        for nonterm in self.__rules__:
-            com_rule = self.__rules__[nonterm]
-            for rule in com_rule:
-                if __EPSILON__ in self.__rules__.first(rule.rhs()):
-                    for term in self.__rules__.follow(rule.lhs()):
-                        if Rule.is_terminal(term) and term != __EPSILON__:
-                            self.__parsing_table__[nonterm][term].add(rule)
-                        elif term == __END__:
-                            self.__parsing_table__[nonterm][term].add(rule)
-                for term in self.__rules__.first(rule.rhs()):
-                    if Rule.is_terminal(term) and term != __EPSILON__:
-                        self.__parsing_table__[nonterm][term].add(rule)
-    def parse(self, string):
-        """parse the string"""
+        if table is not None:
+            self.__grammar__ = Grammar.load(rules, *table[:-1])
+            cells = table[-1]
+        else:
+            self.__grammar__ = Grammar.compile(rules)
+            cells = self.__build_table__()
+        grammar = self.__grammar__
+        self.__cells__ = cells
+        rank = dict((str(Rule(spec)), i) for i, spec in enumerate(precedence))
+        # conflicting cell -> production chosen by precedence, or None
+        self.__resolved__ = {}
+        for nonterm, term, cell in cells:
+            if len(cell) > 1:
+                declared = [i for i in cell if str(grammar.rule(i)) in rank]
+                self.__resolved__[nonterm, term] = min(declared,
+                    key=lambda i: rank[str(grammar.rule(i))]) \
+                    if declared else None
+        self.__conflicts__ = [cell for cell in cells \
+            if len(cell[2]) > 1 and self.__resolved__[cell[:2]] is None]
+        if strict and self.__conflicts__:
+            raise GrammarError([conflict for conflict in \
+                self.conflict_report() if conflict.chosen is None])
+        # a dense nonterminal x terminal array of productions, the extra
+        # last column is for lexical units not in the grammar
+        nonterminal_count = grammar.nonterminal_count()
+        self.__width__ = len(grammar.symbols()) - nonterminal_count + 1
+        from array import array
+        self.__parsing_table__ = array('i',
+            [__ERROR__]) * (nonterminal_count * self.__width__)
+        for nonterm, term, cell in cells:
+            production = cell[0] if len(cell) == 1 else \
+                self.__resolved__[nonterm, term]
+            self.__parsing_table__[nonterm * self.__width__ + term - \
+                nonterminal_count] = \
+                __CONFLICT__ if production is None else production
+        self.__actions__ = grammar.has_actions()
+        self.__sync__ = {} # nonterminal -> ids of `__sync_set__`
+        # the rhs of each production, reversed to be pushed on the stack
+        self.__expansions__ = [tuple(reversed(rhs)) \
+            for _, rhs in grammar.productions()]
+    def __build_table__(self):
+        """return the cells of the parsing table, see `dump_table`"""
+        grammar = self.__grammar__
+        ids = grammar.ids()
+        cells = {}
+        for i, (lhs, _) in enumerate(grammar.productions()):
+            rule = grammar.rule(i)
+            first = self.__rules__.first(rule.rhs())
+            for term in first:
+                if term != __EPSILON__:
+                    cells.setdefault((lhs, ids[term]), set()).add(i)
+            if __EPSILON__ in first:
+                for term in self.__rules__.follow(rule.lhs()):
+                    cells.setdefault((lhs, ids[term]), set()).add(i)
+        return tuple((nonterm, term, tuple(sorted(cell))) \
+            for (nonterm, term), cell in sorted(cells.items()))
+    def grammar(self):
+        """getter : the compiled Grammar"""
+        return self.__grammar__
+    def conflicts(self):
+        """
+        getter : conflicting cells of the parsing table which are not
+        resolved by precedence, as tuples `(nonterminal, terminal,
+        (production, ...))`
+        """
+        return self.__conflicts__
+    def conflict_report(self):
+        """
+        return the list of the Conflict's of the parsing table, including
+        those resolved by precedence
+        """
+        grammar = self.__grammar__
+        symbols = grammar.symbols()
+        report = []
+        for nonterm, term, cell in self.__cells__:
+            if len(cell) < 2:
+                continue
+            rules = tuple(grammar.rule(i) for i in cell)
+            chosen = self.__resolved__[nonterm, term]
+            report.append(Conflict(symbols[nonterm], symbols[term], rules,
+                tuple('FIRST' if symbols[term] in \
+                self.__rules__.first(rule.rhs()) else 'FOLLOW' \
+                for rule in rules),
+                None if chosen is None else grammar.rule(chosen)))
+        return report
+    def dump_table(self):
+        """
+        return the parsing table in a compact form made of tuples of
+        integers, `(symbols, nonterminal_count, start, productions,
+        cells)`, where the first four are those of `Grammar.dump` and
+        `cells` is a tuple of `(nonterminal, terminal, (production, ...))`;
+        it can be pickled or marshaled and given to the constructor later
+        """
+        return self.__grammar__.dump() + (self.__cells__,)
+    def parse(self, string, tracer=None):
+        """
+        parse the string
+
+        tokens are pulled from the lexer one at a time, so the input is
+        never materialized as a token list, and a syntax error is raised
+        as soon as the offending token is scanned
+
+        `tracer` is an optional callable which is called with
+        `('match', token)` whenever a token is matched and with
+        `('expand', rule)` whenever a nonterminal is expanded, see
+        `print_tracer`
+
+        return the value synthesized by the semantic action of the start
+        rule, see `yacc`
+        """
+        self.__lexer__.set_string(string)
+        return self.parse_tokens(self.__lexer__.get_next_token(), tracer)
+    def parse_tokens(self, tokens, tracer=None):
+        """
+        parse a token stream of the lexer, such as one returned by
+        `get_next_token_of` for chunked input, see `parse`
+        """
+        return self.__run__(tokens, [self.__grammar__.start()], [],
+            tracer, None)
+    def parse_incremental(self, string, interval=64):
+        """
+        parse the string and keep it parsed while it is edited, see
+        `IncrementalParse`
+        """
+        return IncrementalParse(self, string, interval)
+    def parse_recovering(self, string, tracer=None, repair=True):
+        """
+        parse the string, recovering from syntax errors instead of
+        stopping at the first one, so that all of them are found at once
+
+        on an unexpected token, if `repair` is true and the token after it
+        is expected, the token is deleted; otherwise a missing terminal is
+        inserted, and a nonterminal is recovered in panic mode: tokens are
+        skipped up to one which it can begin with, or one of its FOLLOW
+        set, where it is given up; the value of a symbol inserted or given
+        up is None; if the input goes on once the start symbol is derived,
+        the tokens up to one it can begin with are skipped and the rest is
+        parsed again from the start symbol, whose first value is returned
+
+        return `(value, errors)`, where `errors` is the list of the
+        ParseError's in the order of the input
+        """
         self.__lexer__.set_string(string)
-        input_stack = list(reversed(list(self.__lexer__.get_next_token())))
-        end_token = lex.Token(__END__, __END__, self.__lexer__.lineno,
-            self.__lexer__)
-        input_stack.insert(0, end_token)
-        grammar_stack = [self.__rules__.start_symbol()]
-        while grammar_stack:
-            X, a = grammar_stack[-1], input_stack[-1]
-            if X == a.lexical_unit() or \
-                (X == __EPSILON__ and a.lexical_unit() == __END__):
-                print 'Match =>', a
-                grammar_stack.pop()
-                input_stack.pop()
-            elif Rule.is_terminal(X):
-                raise ParseError(
+        errors = []
+        value = self.__run__(self.__lexer__.get_next_token(),
+            [self.__grammar__.start()], [], tracer, None, errors, repair)
+        return value, errors
+    def __run__(self, tokens, stack, values, tracer, checkpoint,
+        errors=None, repair=False):
+        """
+        run the parse on the token stream from the state `stack`,
+        `values`; `checkpoint`, if not None, is called with the stack and
+        the values after every matched token, and the parse stops,
+        returning None, as soon as it returns true
+
+        a syntax error is raised, or if `errors` is a list, appended to it
+        before recovering from it, see `parse_recovering`
+        """
+        grammar = self.__grammar__
+        ids = grammar.ids()
+        symbols = grammar.symbols()
+        unknown = len(symbols)
+        nonterminal_count = grammar.nonterminal_count()
+        productions = grammar.productions()
+        expansions = self.__expansions__
+        table = self.__parsing_table__
+        width = self.__width__
+        tokens = iter(tokens)
+        a = __lookahead__(self.__lexer__, tokens)
+        a_id = ids.get(a.lexical_unit(), unknown)
+        end = ids[__END__]
+        # nonnegative items are symbols, ~production marks the end of the
+        # rhs of that production
+        while stack or a_id != end and errors is not None:
+            if not stack:
+                # the start symbol is derived but the input goes on: drop
+                # the stray token and the ones the start symbol cannot
+                # begin with, and parse the rest as another input
+                errors.append(ParseError('unexpected %s in line %d' % \
+                    (a.value, a.lineno)))
+                start = grammar.start()
+                a = __lookahead__(self.__lexer__, tokens, a)
+                a_id = ids.get(a.lexical_unit(), unknown)
+                while a_id != end and table[start * width + a_id - \
+                    nonterminal_count] == __ERROR__:
+                    a = __lookahead__(self.__lexer__, tokens, a)
+                    a_id = ids.get(a.lexical_unit(), unknown)
+                if a_id != end:
+                    stack.append(start)
+                continue
+            X = stack.pop()
+            if X < 0:
+                # all the rhs of the production is derived, reduce values
+                size = len(productions[~X][1])
+                p = [None] + values[len(values) - size:]
+                del values[len(values) - size:]
+                func = grammar.rule(~X).func()
+                if func is not None:
+                    func(p)
+                values.append(p[0])
+            elif X == a_id:
+                if tracer is not None:
+                    tracer('match', a)
+                if self.__actions__:
+                    values.append(a.value)
+                if checkpoint is not None and checkpoint(stack, values):
+                    return None
+                a = __lookahead__(self.__lexer__, tokens, a)
+                a_id = ids.get(a.lexical_unit(), unknown)
+            elif X >= nonterminal_count:
+                error = ParseError(
                     '%s is expected in line %d but not found' %\
-                    (X, a.lineno))
-            elif not self.__parsing_table__[X][a.lexical_unit()]:
-                raise ParseError('unexpected %s in line %d' %\
-                    (a.value, a.lineno))
-            elif len(self.__parsing_table__[X][a.lexical_unit()]) > 1:
-                raise AssertionError('parse stop: ambiguious `%s`, `%s`' %\
-                    (X, a))
+                    (symbols[X], a.lineno))
+                if errors is None:
+                    raise error
+                errors.append(error)
+                a, a_id, tokens = self.__recover__(X, a, tokens, stack,
+                    values, repair)
             else:
-                rule = list(self.__parsing_table__[X][a.lexical_unit()])[0]
-                print 'Using =>', rule
-                grammar_stack.pop()
-                if not rule.is_epsilon():
-                    grammar_stack += list(reversed(rule.rhs()))
+                production = table[X * width + a_id - nonterminal_count]
+                if production < 0:
+                    if production == __CONFLICT__:
+                        raise AssertionError(
+                            'parse stop: ambiguious `%s`, `%s`' %\
+                            (symbols[X], a))
+                    error = ParseError('unexpected %s in line %d' %\
+                        (a.value, a.lineno))
+                    if errors is None:
+                        raise error
+                    errors.append(error)
+                    a, a_id, tokens = self.__recover__(X, a, tokens, stack,
+                        values, repair)
+                    continue
+                if tracer is not None:
+                    tracer('expand', grammar.rule(production))
+                if self.__actions__:
+                    stack.append(~production)
+                stack += expansions[production]
+        if a.lexical_unit() != __END__:
+            error = ParseError('unexpected %s in line %d' % \
+                (a.value, a.lineno))
+            if errors is None:
+                raise error
+            errors.append(error)
+        return values[0] if values else None
+    def __recover__(self, X, a, tokens, stack, values, repair):
+        """
+        recover from a syntax error at the token `a` on the symbol `X`,
+        which is popped from `stack`, see `parse_recovering`; return the
+        next lookahead, its id, and the rest of the token stream
+        """
+        from itertools import chain
+        grammar = self.__grammar__
+        ids = grammar.ids()
+        unknown = len(grammar.symbols())
+        nonterminal_count = grammar.nonterminal_count()
+        def expects(token_id):
+            """whether `X` can begin with the token of id `token_id`"""
+            if X >= nonterminal_count:
+                return X == token_id
+            return self.__parsing_table__[X * self.__width__ + token_id - \
+                nonterminal_count] >= 0
+        a_id = ids.get(a.lexical_unit(), unknown)
+        if repair and a.lexical_unit() != __END__:
+            b = __lookahead__(self.__lexer__, tokens, a)
+            b_id = ids.get(b.lexical_unit(), unknown)
+            if expects(b_id):
+                # delete `a`
+                stack.append(X)
+                return b, b_id, tokens
+            tokens = chain([b], tokens)
+        if X < nonterminal_count:
+            # panic mode
+            sync = self.__sync_set__(X)
+            while not expects(a_id) and a_id not in sync:
+                a = __lookahead__(self.__lexer__, tokens, a)
+                a_id = ids.get(a.lexical_unit(), unknown)
+            if expects(a_id):
+                stack.append(X)
+                return a, a_id, tokens
+        # the terminal is inserted, or the nonterminal given up
+        if self.__actions__:
+            values.append(None)
+        return a, a_id, tokens
+    def __sync_set__(self, nonterm):
+        """
+        the ids of the FOLLOW set of the nonterminal `nonterm` and of the
+        end marker, where panic mode stops
+        """
+        if nonterm not in self.__sync__:
+            grammar = self.__grammar__
+            ids = grammar.ids()
+            self.__sync__[nonterm] = frozenset([grammar.end()] + \
+                [ids[term] for term in self.__rules__.follow(
+                grammar.symbols()[nonterm]) if term in ids])
+        return self.__sync__[nonterm]
     def __print_parsing_table__(self):
         from prettytable import PrettyTable
-        table = PrettyTable(
-            [''] + [term for term in self.__rules__.terminals()] + [__END__]
-        )
-        for nonterm in self.__rules__.nonterminals():
-            row = [ nonterm ]
-            for term in self.__rules__.terminals():
-                row.append('; '.join([str(rule) \
-                    for rule in self.__parsing_table__[nonterm][term]])
-                )
-            row.append('; '.join([str(rule) \
-                for rule in self.__parsing_table__[nonterm][__END__]])
-            )
-            table.add_row(row)
+        grammar = self.__grammar__
+        symbols = grammar.symbols()
+        terms = range(grammar.nonterminal_count(), len(symbols))
+        cells = dict(((nonterm, term), cell) \
+            for nonterm, term, cell in self.__cells__)
+        table = PrettyTable([''] + [symbols[term] for term in terms])
+        for nonterm in range(grammar.nonterminal_count()):
+            table.add_row([symbols[nonterm]] + ['; '.join([
+                str(grammar.rule(i)) \
+                for i in cells.get((nonterm, term), ())]) for term in terms])
         print table
 
-def yacc():
-    """return a Parser"""
+class IncrementalParse:
+    """
+    an input kept parsed by an LL1Parser while it is edited
+
+    the tokens are kept in a TokenList and the parser state is saved
+    every `interval` tokens; after an edit only the tokens from the edit
+    on are scanned again, see `Lexer.relex`, and the parse resumes from
+    the last state saved before them; a grammar without semantic actions
+    stops there as soon as the state meets a saved one of the old parse
+    """
+    def __init__(self, parser, string, interval=64):
+        self.__parser__ = parser
+        self.__interval__ = interval
+        lexer = parser.__lexer__
+        lexer.set_string(string)
+        self.__string__ = string
+        self.__tokens__ = lexer.get_token_list()
+        # (token index, stack, values) before the token of that index
+        self.__checkpoints__ = [(0, (parser.grammar().start(),), [])]
+        self.__result__ = None
+        self.__failed__ = True
+        self.__parse__(0, None, 0, [])
+    def __parse__(self, changed, reused, delta, old):
+        """
+        parse again from the token `changed`; the tokens from `reused` on
+        are the old ones, shifted by `delta`, whose states are `old`
+        """
+        parser = self.__parser__
+        interval = self.__interval__
+        tokens = self.__tokens__
+        checkpoints = self.__checkpoints__
+        while checkpoints[-1][0] > changed:
+            checkpoints.pop()
+        start, stack, values = checkpoints[-1]
+        old_stacks = {}
+        if not self.__failed__ and not parser.grammar().has_actions():
+            old_stacks = dict((i, s) for i, s, _ in old)
+        stopped = []
+        index = [start]
+        def checkpoint(stack, values):
+            index[0] += 1
+            i = index[0]
+            # the old states are at the old indices, which are only
+            # multiples of `interval` if `delta` is, so look at every one
+            if i >= reused and i - delta in old_stacks and \
+                old_stacks[i - delta] == tuple(stack):
+                stopped.append(i)
+                return True
+            if i % interval:
+                return False
+            checkpoints.append((i, tuple(stack), list(values)))
+            return False
+        self.__failed__ = True
+        result = parser.__run__(tokens.iterate(start),
+            list(stack), list(values), None, checkpoint)
+        if stopped:
+            checkpoints.extend((i + delta, s, v) \
+                for i, s, v in old if i + delta >= stopped[0])
+            result = self.__result__
+        self.__result__ = result
+        self.__failed__ = False
+        return result
+    def edit(self, offset, deleted, inserted):
+        """
+        replace `deleted` characters at `offset` by the string `inserted`
+        and parse the edited input
+
+        return the value synthesized by the semantic action of the start
+        rule, ParseError is raised as by `LL1Parser.parse`
+        """
+        lexer = self.__parser__.__lexer__
+        lexer.set_string(self.__string__)
+        count = len(self.__tokens__)
+        tokens, changed, reused = lexer.relex(self.__tokens__,
+            offset, deleted, inserted)
+        self.__string__ = lexer.__string__
+        delta = len(tokens) - count
+        checkpoints = self.__checkpoints__
+        old = [c for c in checkpoints if c[0] > changed]
+        return self.__parse__(changed, reused, delta, old)
+    def result(self):
+        """getter : the value of the last successful parse"""
+        return self.__result__
+    def tokens(self):
+        """getter : the TokenList of the current input"""
+        return self.__tokens__
+    def string(self):
+        """getter : the current input"""
+        return self.__string__
+
+class LALRParser:
+    """a defined LALR(1) CFG Parser"""
+    def __init__(self, lexer, rules, table=None):
+        """
+        `rules` is a Rules, which may be left recursive
+
+        `table` is an optional parsing table of the same rules returned
+        by `dump_table`; if it is given, the grammar is not analysed
+
+        shift/reduce conflicts are resolved in favor of shifting and
+        reduce/reduce conflicts in favor of the first production, both
+        are recorded in `conflicts`
+        """
+        self.__lexer__ = lexer
+        self.__rules__ = rules
+        self.__table__ = self.__build_table__() if table is None else table
+        symbols, productions, action, goto, conflicts = self.__table__
+        self.__conflicts__ = [(kind, state, symbols[term]) \
+            for kind, state, term in conflicts]
+        rules = {}
+        for nonterm in self.__rules__:
+            for rule in self.__rules__[nonterm]:
+                rules[rule.lhs(), tuple(term for term in rule.rhs() \
+                    if term != __EPSILON__)] = rule
+        self.__productions__ = [(rules.get((symbols[lhs],
+            tuple(symbols[term] for term in rhs))), symbols[lhs], len(rhs)) \
+            for lhs, rhs in productions]
+        self.__action__ = [dict((symbols[term], act) for term, act in row) \
+            for row in action]
+        self.__goto__ = [dict((symbols[nonterm], state) \
+            for nonterm, state in row) for row in goto]
+    def __build_table__(self):
+        """
+        build the LALR(1) table by computing the LR(0) item sets and
+        then their lookaheads by propagation
+        """
+        rules = self.__rules__
+        symbols = sorted(rules.nonterminals()) + \
+            sorted(rules.terminals().union([__END__]) - set([__EPSILON__]))
+        # production 0 is the augmented start rule, whose lhs is $
+        prods = [(__END__, (rules.start_symbol(),))]
+        prods_of = {}
+        for nonterm in sorted(rules):
+            for rule in sorted(rules[nonterm], key=str):
+                prods_of.setdefault(nonterm, []).append(len(prods))
+                prods.append((nonterm,
+                    tuple(term for term in rule.rhs() if term != __EPSILON__)))
+        first = dict((nonterm, rules.first(nonterm)) for nonterm in prods_of)
+        def first_seq(seq, lookahead):
+            """FIRST set of the symbols `seq` followed by `lookahead`"""
+            result = set()
+            for term in seq:
+                if term not in prods_of:
+                    result.add(term)
+                    return result
+                result.update(first[term])
+                if __EPSILON__ not in first[term]:
+                    return result
+                result.discard(__EPSILON__)
+            result.add(lookahead)
+            return result
+        def closure0(kernel):
+            """closure of a set of LR(0) items (production, dot)"""
+            result = set(kernel)
+            work = list(result)
+            while work:
+                prod, dot = work.pop()
+                rhs = prods[prod][1]
+                if dot < len(rhs) and rhs[dot] in prods_of:
+                    for other in prods_of[rhs[dot]]:
+                        if (other, 0) not in result:
+                            result.add((other, 0))
+                            work.append((other, 0))
+            return result
+        def closure(items):
+            """closure of a set of LR(1) items (production, dot, lookahead)"""
+            result = set(items)
+            work = list(result)
+            while work:
+                prod, dot, lookahead = work.pop()
+                rhs = prods[prod][1]
+                if dot < len(rhs) and rhs[dot] in prods_of:
+                    for term in first_seq(rhs[dot + 1:], lookahead):
+                        for other in prods_of[rhs[dot]]:
+                            if (other, 0, term) not in result:
+                                result.add((other, 0, term))
+                                work.append((other, 0, term))
+            return result
+        # LR(0) item sets, identified by their kernels
+        states = [frozenset([(0, 0)])]
+        state_ids = {states[0]: 0}
+        gotos = []
+        for kernel in states:
+            moves = {}
+            for prod, dot in closure0(kernel):
+                rhs = prods[prod][1]
+                if dot < len(rhs):
+                    moves.setdefault(rhs[dot], set()).add((prod, dot + 1))
+            gotos.append({})
+            for term in sorted(moves):
+                target = frozenset(moves[term])
+                if target not in state_ids:
+                    state_ids[target] = len(states)
+                    states.append(target)
+                gotos[-1][term] = state_ids[target]
+        # lookaheads of the kernel items; `#` marks a propagated one
+        lookaheads = [dict((item, set()) for item in kernel) \
+            for kernel in states]
+        lookaheads[0][0, 0].add(__END__)
+        propagation = []
+        closures = {} # kernel item -> closure of (item, '#')
+        for i, kernel in enumerate(states):
+            for item in kernel:
+                if item not in closures:
+                    closures[item] = closure([item + ('#',)])
+                for prod, dot, lookahead in closures[item]:
+                    rhs = prods[prod][1]
+                    if dot == len(rhs):
+                        continue
+                    target = gotos[i][rhs[dot]], (prod, dot + 1)
+                    if lookahead == '#':
+                        propagation.append(((i, item), target))
+                    else:
+                        lookaheads[target[0]][target[1]].add(lookahead)
+        changed = True
+        while changed:
+            changed = False
+            for (i, item), (j, target) in propagation:
+                size = len(lookaheads[j][target])
+                lookaheads[j][target].update(lookaheads[i][item])
+                changed = changed or size != len(lookaheads[j][target])
+        symbol_ids = dict((symbol, i) for i, symbol in enumerate(symbols))
+        action, goto, conflicts = [], [], []
+        for i, kernel in enumerate(states):
+            acts = dict((term, state) for term, state in gotos[i].items() \
+                if term not in prods_of)
+            reductions = set()
+            for item in kernel:
+                for prod, dot, lookahead in closures[item]:
+                    if dot != len(prods[prod][1]):
+                        continue
+                    if lookahead == '#':
+                        reductions.update((prod, lookahead) \
+                            for lookahead in lookaheads[i][item])
+                    else:
+                        reductions.add((prod, lookahead))
+            for prod, lookahead in sorted(reductions):
+                if lookahead not in acts:
+                    acts[lookahead] = -prod
+                elif acts[lookahead] > 0:
+                    conflicts.append(
+                        ('shift/reduce', i, symbol_ids[lookahead]))
+                elif acts[lookahead] != -prod:
+                    conflicts.append(
+                        ('reduce/reduce', i, symbol_ids[lookahead]))
+            action.append(tuple(sorted((symbol_ids[term], act) \
+                for term, act in acts.items())))
+            goto.append(tuple(sorted((symbol_ids[term], state) \
+                for term, state in gotos[i].items() if term in prods_of)))
+        productions = tuple((symbol_ids[lhs],
+            tuple(symbol_ids[term] for term in rhs)) for lhs, rhs in prods)
+        return tuple(symbols), productions, tuple(action), tuple(goto), \
+            tuple(conflicts)
+    def conflicts(self):
+        """
+        getter : conflicts found while building the table, as tuples
+        `(kind, state, terminal)`
+        """
+        return self.__conflicts__
+    def dump_table(self):
+        """
+        return the parsing table in a compact form made of tuples of
+        integers, `(symbols, productions, action, goto, conflicts)`, where
+        `symbols` is a tuple of all symbol names, `productions` a tuple of
+        `(lhs, (rhs, ...))`, and `action` and `goto` have one tuple of
+        `(symbol, action)` pairs per state; a positive action shifts to
+        that state, a negative one reduces by that production and 0
+        accepts; `conflicts` is a tuple of `(kind, state, symbol)`; it can
+        be given to the constructor later
+        """
+        return self.__table__
+    def parse(self, string, tracer=None):
+        """
+        parse the string
+
+        `tracer` is an optional callable which is called with
+        `('shift', token)` whenever a token is shifted and with
+        `('reduce', rule)` whenever a rule is reduced, see `print_tracer`
+
+        return the value synthesized by the semantic action of the start
+        rule, see `yacc`
+        """
+        self.__lexer__.set_string(string)
+        return self.parse_tokens(self.__lexer__.get_next_token(), tracer)
+    def parse_tokens(self, tokens, tracer=None):
+        """
+        parse a token stream of the lexer, such as one returned by
+        `get_next_token_of` for chunked input, see `parse`
+        """
+        tokens = iter(tokens)
+        a = __lookahead__(self.__lexer__, tokens)
+        states = [0]
+        values = []
+        while True:
+            act = self.__action__[states[-1]].get(a.lexical_unit())
+            if act is None:
+                raise ParseError('unexpected %s in line %d' %\
+                    (a.value, a.lineno))
+            elif act > 0:
+                if tracer is not None:
+                    tracer('shift', a)
+                states.append(act)
+                values.append(a.value)
+                a = __lookahead__(self.__lexer__, tokens, a)
+            elif act < 0:
+                rule, lhs, size = self.__productions__[-act]
+                if tracer is not None:
+                    tracer('reduce', rule)
+                p = [None] + values[len(values) - size:]
+                if size:
+                    del values[-size:]
+                    del states[-size:]
+                if rule.func() is not None:
+                    rule.func()(p)
+                values.append(p[0])
+                states.append(self.__goto__[states[-1]][lhs])
+            else:
+                return values[-1] if values else None
+
+def print_tracer(event, value):
+    """a tracer for `parse` of the parsers which prints every step"""
+    print {'match': 'Match =>', 'expand': 'Using =>',
+        'shift': 'Shift =>', 'reduce': 'Reduce =>'}[event], value
+
+def yacc(cache_dir=None, method='LL1', optimize=False, reporter=None,
+    strict=False):
+    """
+    return a Parser
+
+    the grammar is made of the rules in the variable `grammar`, followed
+    by the rules in the docstrings of the `p_*` functions, one per line,
+    where a line `| t1 t2 ...` is another rule of the lhs of the line
+    above it (an empty one is epsilon); the first rule is the start rule
+
+    a `p_*` function is the semantic action of the rules in its
+    docstring: when such a rule is completely derived during the parse,
+    the function is called with a list `p`, where `p[1:]` are the values
+    of the rhs symbols (the token value of a terminal, and the value
+    synthesized by a nonterminal) and it should store the value of the
+    lhs in `p[0]`; `parse` returns the value of the start symbol
+
+    `cache_dir` is an optional directory in which the parsing table is
+    cached, keyed by the grammar; a later call with the same grammar
+    loads the table instead of analysing the grammar again
+
+    `method` is either 'LL1' for a LL1Parser or 'LALR' for a LALRParser
+
+    if `optimize` is true, the parser is built from `Rules.optimize` of
+    the grammar, which reports its changes to the optional callable
+    `reporter`
+
+    the conflicts of a LL1Parser are resolved by the rules listed in the
+    optional variable `precedence`, and raise GrammarError if `strict` is
+    true, see `LL1Parser`
+    """
+    parser_class = {'LL1': LL1Parser, 'LALR': LALRParser}.get(method)
+    if parser_class is None:
+        raise ValueError('unknown parsing method `%s`' % method)
     import sys
     all_vars = sys._getframe(1).f_locals
     if 'lexer' not in all_vars:
@@ -382,17 +1477,54 @@ def yacc():
             'Yacc need variable `lexer` but not defined'
         )
     lexer = all_vars['lexer']
-    rules = Rules()
-    if 'grammar' not in all_vars:
+    actions = []
+    for name, func in all_vars.items():
+        if name.startswith('p_') and callable(func):
+            if not func.__doc__:
+                raise SyntaxError(
+                    'function `%s` has no rule in its docstring' % name
+                )
+            actions.append(func)
+    actions.sort(key=lambda func: func.func_code.co_firstlineno)
+    funcs = {}
+    action_rules = []
+    parsed = []
+    for func in actions:
+        lhs = None
+        for line in func.__doc__.splitlines():
+            line = line.strip()
+            if line.startswith('|'):
+                # an alternative of the rule on the previous line
+                if lhs is None:
+                    raise SyntaxError(
+                        'Syntax rule `%s` not valid' % line
+                    )
+                line = '%s : %s' % (lhs, line[1:].strip() or __EPSILON__)
+            if line:
+                rule = Rule(line, func)
+                lhs = rule.lhs()
+                production = lhs, tuple(rule.rhs())
+                if production in funcs:
+                    raise SyntaxError(
+                        'rule `%s` has two actions, `%s` and `%s`' % \
+                        (rule, funcs[production].__name__, func.__name__)
+                    )
+                funcs[production] = func
+                action_rules.append(line)
+                parsed.append(rule)
+    if 'grammar' not in all_vars and not actions:
         raise NotImplementedError(
             'Yacc need variable `grammar` but not defined'
         )
-    grammar = all_vars['grammar']
+    grammar = tuple(all_vars.get('grammar', ()))
+    parsed = [Rule(raw_rule) for raw_rule in grammar] + parsed
+    grammar += tuple(action_rules)
+    rules = Rules()
     first = True
-    for raw_rule in grammar:
-        rule = Rule(raw_rule, None)
-        rules.setdefault(rule.lhs())
-        rules[rule.lhs()].add(rule)
+    for rule in parsed:
+        if rule.func() is None:
+            rule.set_func(funcs.get((rule.lhs(), tuple(rule.rhs()))))
+        rules.add(rule)
         if first:
             rules.set_start_rule(rule)
             first = False
@@ -402,4 +1534,108 @@ def yacc():
             raise NameError(
                 'terminal `%s` not defined as a token' % term
             )
-    return LL1Parser(lexer, rules)
+    if optimize:
+        rules = rules.optimize(reporter)
+    options = {}
+    if method == 'LL1':
+        options = {'precedence': all_vars.get('precedence', ()),
+            'strict': strict}
+    if not cache_dir:
+        return parser_class(lexer, rules, **options)
+    # the optimized grammar also depends on which rules have actions
+    key = (__PARSETAB_VERSION__, method, grammar, tuple(action_rules),
+        bool(optimize))
+    table = lex.__load_cache__(cache_dir, 'parsetab', key)
+    if table is not None:
+        try:
+            return parser_class(lexer, rules, table, **options)
+        except (KeyError, IndexError, ValueError, TypeError):
+            pass # the table does not fit the rules, build it again
+    parser = parser_class(lexer, rules, **options)
+    lex.__save_cache__(cache_dir, 'parsetab', key, parser.dump_table())
+    return parser
+
+class FileResult(namedtuple('FileResult', 'path value error')):
+    """
+    the outcome of parsing a file in `parse_files`: `value` is the value
+    returned by the parser, or None if the file could not be read, scanned
+    or parsed, in which case `error` is the exception raised
+    """
+    __slots__ = ()
+
+class FileError(Exception):
+    """
+    stands for an exception raised while parsing a file in a worker of
+    `parse_files` which cannot be pickled back; its message is the name
+    of the type of that exception and its message
+    """
+    pass
+
+def __portable_error__(error):
+    """`error`, or a FileError for it if it does not survive pickling"""
+    try:
+        import cPickle as pickle
+    except ImportError:
+        import pickle
+    try:
+        pickle.loads(pickle.dumps(error, pickle.HIGHEST_PROTOCOL))
+        return error
+    except Exception: # pickling or unpickling failed
+        return FileError('%s: %s' % (type(error).__name__, error))
+
+# the parsers built in this process by `parse_files`, by factory
+__WORKER_PARSERS__ = {}
+
+def __parse_file__(factory, path, portable=False):
+    """
+    parse a file with the parser of `factory`, built once per process;
+    any exception is returned in the FileResult, made picklable if
+    `portable` is true
+    """
+    try:
+        parser = __WORKER_PARSERS__.get(factory)
+        if parser is None:
+            parser = __WORKER_PARSERS__[factory] = factory()
+        lexer = parser.__lexer__
+        lexer.set_file(path)
+        return FileResult(path,
+            parser.parse_tokens(lexer.get_next_token()), None)
+    except Exception, e:
+        return FileResult(path, None, __portable_error__(e) if portable \
+            else e)
+
+def parse_files(factory, paths, workers=None):
+    """
+    parse many files in a pool of `workers` processes, as many as the
+    cpu count by default, or in this process if `workers` is 1
+
+    `factory` is a callable, which must be picklable, such as a module
+    level function, returning a parser; every process calls it once,
+    so the lexer and the parsing table are built, or loaded from a cache,
+    see `yacc`, once per process
+
+    return a list of FileResult's in the order of `paths`; the values
+    returned by the parser must be picklable, an exception which is not
+    is replaced by a FileError
+    """
+    paths = list(paths)
+    if workers == 1:
+        return [__parse_file__(factory, path) for path in paths]
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+    except ImportError:
+        from multiprocessing import Pool
+        pool = Pool(workers)
+        try:
+            return pool.map(__parse_file_of__,
+                [(factory, path, True) for path in paths])
+        finally:
+            pool.close()
+            pool.join()
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(__parse_file__,
+            [factory] * len(paths), paths, [True] * len(paths)))
+
+def __parse_file_of__(args):
+    """`__parse_file__` of a `(factory, path, portable)`, for Pool.map"""
+    return __parse_file__(*args)